@@ -1,10 +1,24 @@
 # -*- mode: python ; coding: utf-8 -*-
 
 import os
-from PyInstaller.utils.hooks import collect_data_files
+from PyInstaller.utils.hooks import collect_data_files, collect_submodules
 
 block_cipher = None
 
+# ビルドプロファイル: set LOG2EXIF_BUILD=lean（build_exe.bat lean）で軽量版
+# - 標準: UPX圧縮した1ファイルのEXE（起動のたびに一時フォルダへ展開される）
+# - lean: 未使用のPillowプラグイン等を除外し、UPXなしのフォルダ形式（展開不要で起動が速い）
+LEAN = os.environ.get('LOG2EXIF_BUILD', '').lower() == 'lean'
+
+# Pillowは読み取れないJPEGのフォールバックでしか使わないため、JPEG関連のプラグインだけ残す
+PIL_KEEP = {'PIL.JpegImagePlugin', 'PIL.JpegPresets', 'PIL.MpoImagePlugin', 'PIL.TiffImagePlugin', 'PIL.TiffTags'}
+excludes = []
+if LEAN:
+    excludes += [name for name in collect_submodules('PIL')
+                 if name.endswith('ImagePlugin') and name not in PIL_KEEP]
+    excludes += ['PIL.ImageTk', 'PIL._tkinter_finder', 'PIL.ImageQt', 'PIL.ImageShow',
+                 'numpy', 'unittest', 'pydoc', 'doctest']
+
 # データファイルを収集
 datas = []
 
@@ -17,8 +31,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=datas,
-    hiddenimports=[
-        'PIL._tkinter_finder',
+    hiddenimports=([] if LEAN else ['PIL._tkinter_finder']) + [
         'tkinter',
         'tkinter.filedialog',
         'tkinter.messagebox',
@@ -27,7 +40,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -36,24 +49,52 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='Log2Exif',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,  # GUIアプリなのでコンソールを表示しない
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-)
+if LEAN:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='Log2Exif',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,  # GUIアプリなのでコンソールを表示しない
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        strip=False,
+        upx=False,
+        name='Log2Exif',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.zipfiles,
+        a.datas,
+        [],
+        name='Log2Exif',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=True,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,  # GUIアプリなのでコンソールを表示しない
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
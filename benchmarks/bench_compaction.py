@@ -0,0 +1,174 @@
+"""
+Timeline compaction benchmark: compacts a timeline and compares it with the
+original in size, cache load time, lookup speed and match results.
+
+    python benchmarks/bench_compaction.py --days 30
+    python benchmarks/bench_compaction.py --timeline Timeline.json --meters 10 --seconds 300
+    python benchmarks/bench_compaction.py --days 30 --min-ratio 4 --max-error 10
+    python benchmarks/bench_compaction.py --max-gap 30 1 0.5
+
+Without --timeline, a synthetic history is generated: a point every
+--interval seconds, with GPS jitter while staying at home or work and
+commutes in between. Match results are compared at random photo times for
+every match mode and every --max-gap; like run_job, the compaction interval is
+capped at max_gap, so no photo may change between matched and unmatched.
+Exits with code 1 if a photo changed between matched and unmatched, the point
+count shrank less than --min-ratio or a photo moved by more than --max-error
+metres.
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+
+from synthetic import ROOT  # noqa: F401 (puts the repository on sys.path)
+
+from src.compaction import COMPACT_METERS, COMPACT_SECONDS, compact_timeline, distance_m
+from src.gps_utils import MATCH_MODES, TimelineIndex
+from src.timeline_cache import load_cached_timeline, save_cached_timeline
+from src.timeline_formats import load_timeline_points
+
+START = 1735657200.0  # 2025-01-01 00:00 +09:00
+HOME = (35.6812, 139.7671)
+WORK = (35.6580, 139.7016)
+# Degrees of GPS noise while sitting still (about 5 m)
+JITTER = 0.00005
+
+def make_history(days, interval, seed=1):
+    """
+    Builds a TimelineIndex for days of home -> work -> home, sampled every interval seconds.
+    """
+    rng = random.Random(seed)
+    times, lats, lons, offsets = array('d'), array('d'), array('d'), array('d')
+    # (seconds into the day, place or None while travelling)
+    plan = ((0, HOME), (8 * 3600, None), (9 * 3600, WORK), (18 * 3600, None), (19 * 3600, HOME))
+    for day in range(days):
+        day_start = START + day * 86400
+        for t in range(0, 86400, interval):
+            stage = max(i for i, (begin, _) in enumerate(plan) if begin <= t)
+            place = plan[stage][1]
+            if place is None:
+                origin, target = (HOME, WORK) if stage == 1 else (WORK, HOME)
+                f = (t - plan[stage][0]) / 3600
+                # Commute along a curved road
+                lat = origin[0] + (target[0] - origin[0]) * f + 0.005 * math.sin(math.pi * f)
+                lon = origin[1] + (target[1] - origin[1]) * f
+            else:
+                lat, lon = place
+            times.append(day_start + t)
+            lats.append(lat + rng.uniform(-JITTER, JITTER))
+            lons.append(lon + rng.uniform(-JITTER, JITTER))
+            offsets.append(9 * 3600)
+    return TimelineIndex.build(times, lats, lons, offsets)
+
+def timed(func):
+    began = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - began
+
+def cache_stats(index, work, name, sources, compaction):
+    """
+    Saves index to a cache file and returns (file size in MB, load seconds).
+    """
+    cache_path = os.path.join(work, name)
+    save_cached_timeline(sources, index, cache_path, compaction)
+    loaded, seconds = timed(lambda: load_cached_timeline(sources, cache_path, compaction))
+    assert loaded is not None and len(loaded) == len(index)
+    return os.path.getsize(cache_path) / (1024 * 1024), seconds
+
+def tolerances(meters, seconds, max_gap):
+    """
+    Compaction tolerances as run_job uses them with max_gap (seconds or None).
+    """
+    return meters, seconds if max_gap is None else min(seconds, max_gap)
+
+def match_errors(index, compacted, queries, mode, max_gap):
+    """
+    Returns (sorted distances in metres between the two indexes' matches,
+    number of photos whose matched/unmatched state changed).
+    """
+    before = index.lookup_many(queries, mode, max_gap)
+    after = compacted.lookup_many(queries, mode, max_gap)
+    errors = []
+    changed = 0
+    for a, b in zip(before, after):
+        if (a is None) != (b is None):
+            changed += 1
+        elif a is not None:
+            errors.append(distance_m(a[0], a[1], b[0], b[1]))
+    errors.sort()
+    return errors, changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--timeline", nargs="+", help="Compact real timeline files instead of synthetic data")
+    parser.add_argument("--days", type=int, default=30, help="Days of synthetic history")
+    parser.add_argument("--interval", type=int, default=5, help="Seconds between synthetic points")
+    parser.add_argument("--meters", type=float, default=COMPACT_METERS, help="Compaction tolerance in metres")
+    parser.add_argument("--seconds", type=float, default=COMPACT_SECONDS, help="Compaction tolerance in seconds")
+    parser.add_argument("--photos", type=int, default=100000, help="Random photo times to compare")
+    parser.add_argument("--max-gap", type=float, nargs="+", default=[30, 1],
+                        help="max_gap values in minutes used when comparing (0 = unlimited)")
+    parser.add_argument("--min-ratio", type=float, help="Fail if the point count shrank less than this")
+    parser.add_argument("--max-error", type=float, help="Fail if a match moved more than this many metres")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="log2exif_compact_")
+    failed = False
+    try:
+        if args.timeline:
+            sources = args.timeline
+            index, seconds = timed(lambda: load_timeline_points(sources))
+            print(f"loaded {len(index)} points in {seconds:.2f}s")
+        else:
+            # The cache is keyed by its sources; any existing file will do
+            sources = [os.path.abspath(__file__)]
+            index = make_history(args.days, args.interval)
+        if not index:
+            print("no timeline points")
+            return 1
+
+        rng = random.Random(2)
+        queries = [rng.uniform(index.times[0], index.times[-1]) for _ in range(args.photos)]
+        # One compacted index per distinct tolerance
+        compacted = {}
+        for gap_minutes in args.max_gap:
+            max_gap = gap_minutes * 60 if gap_minutes > 0 else None
+            compaction = tolerances(args.meters, args.seconds, max_gap)
+            print(f"max_gap {f'{gap_minutes:g} min' if max_gap else 'unlimited'}:")
+            if compaction not in compacted:
+                compacted[compaction], seconds = timed(lambda: compact_timeline(index, *compaction))
+                ratio = len(index) / len(compacted[compaction])
+                print(f"compaction ({compaction[0]:g} m, {compaction[1]:g} s): {len(index)} -> "
+                      f"{len(compacted[compaction])} points ({ratio:.1f}x) in {seconds:.2f}s")
+                if len(compacted) == 1:
+                    # Size and speed of the first compaction only; the others only differ in ratio
+                    for name, candidate, key in (("original", index, None),
+                                                 ("compacted", compacted[compaction], compaction)):
+                        size, load_seconds = cache_stats(candidate, work, name + ".bin", sources, key)
+                        _, lookup_seconds = timed(lambda: candidate.lookup_many(queries))
+                        print(f"{name:<10} cache {size:>8.2f} MB  load {load_seconds * 1000:>8.1f} ms  "
+                              f"lookup {args.photos / lookup_seconds:>12.0f}/s")
+                    if args.min_ratio is not None and ratio < args.min_ratio:
+                        print(f"shrank less than {args.min_ratio}x")
+                        failed = True
+
+            for mode in MATCH_MODES:
+                errors, changed = match_errors(index, compacted[compaction], queries, mode, max_gap)
+                worst = errors[-1] if errors else 0.0
+                p99 = errors[int(len(errors) * 0.99)] if errors else 0.0
+                print(f"{mode:<13} error p50 {errors[len(errors) // 2] if errors else 0.0:>7.2f} m  "
+                      f"p99 {p99:>7.2f} m  max {worst:>7.2f} m  match state changed {changed}")
+                if changed or (args.max_error is not None and worst > args.max_error):
+                    failed = True
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Regression benchmark: counts how many times each photo is opened by a full run.
+Every source photo must be opened at most MAX_SOURCE_OPENS times
+(one header read for the capture time, one read for the EXIF write), also
+when the camera clock offset is estimated and applied (--apply-clock-offset),
+which needs every capture time before the first photo is matched.
+
+    python benchmarks/bench_file_opens.py [--photos N]
+"""
+import argparse
+import builtins
+import collections
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import make_photo_tree, write_timeline_json
+
+from src.processor import run_job
+
+MAX_SOURCE_OPENS = 2
+
+def count_opens(func):
+    """
+    Runs func() while counting builtins.open calls per path. Returns (result, counts).
+    """
+    counts = collections.Counter()
+    lock = threading.Lock()
+    real_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        if isinstance(file, (str, bytes, os.PathLike)):
+            with lock:
+                counts[os.path.abspath(file)] += 1
+        return real_open(file, *args, **kwargs)
+
+    builtins.open = counting_open
+    try:
+        return func(), counts
+    finally:
+        builtins.open = real_open
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="log2exif_bench_")
+    try:
+        src = os.path.join(work, "src")
+        dest = os.path.join(work, "dest")
+        start = datetime.datetime(2025, 10, 1, 8, 0, 0)
+        paths = make_photo_tree(src, args.photos, start, gps_every=10, no_exif_every=25)
+        timeline = os.path.join(work, "timeline.json")
+        write_timeline_json(timeline, args.photos * 2, start, step_seconds=60)
+
+        failed = False
+        for name, apply_clock in (("plain", False), ("clock offset applied", True)):
+            shutil.rmtree(dest, ignore_errors=True)
+            began = time.perf_counter()
+            # Photos without EXIF fall back to today's file time, far from the
+            # timeline, so with max_gap they are copied unchanged
+            summary, counts = count_opens(lambda: run_job(timeline, src, dest, workers=4, use_cache=False,
+                                                          max_gap_minutes=30, apply_clock=apply_clock))
+            processed = summary["processed"]
+            elapsed = time.perf_counter() - began
+
+            source_opens = [counts[os.path.abspath(p)] for p in paths]
+            per_photo = sum(source_opens) / len(paths)
+            worst = max(source_opens)
+            print(f"{name}: photos: {processed}, elapsed: {elapsed:.3f}s ({processed / elapsed:.0f} photos/s)")
+            print(f"{name}: source opens per photo: {per_photo:.2f} (max {worst}, limit {MAX_SOURCE_OPENS})")
+            if worst > MAX_SOURCE_OPENS:
+                print("FAIL: photos are opened more often than expected")
+                failed = True
+        if failed:
+            return 1
+        print("OK")
+        return 0
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Memory benchmark: runs the command line tool on growing synthetic archives,
+each in a fresh process, and compares the peak memory reported in the summary.
+In --low-memory mode the peak should stay flat as the photo count grows.
+
+    python benchmarks/bench_memory.py --photos 2000 20000
+    python benchmarks/bench_memory.py --photos 2000 20000 --max-growth 20
+    python benchmarks/bench_memory.py --photos 2000 20000 --apply-clock-offset --max-growth 20
+
+With --max-growth, exits with code 1 if the peak memory of the largest run
+exceeds the smallest by more than that many MB.
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from synthetic import ROOT, make_photo_tree, write_timeline_json
+
+START = datetime.datetime(2025, 1, 1, 0, 0, 0)
+
+def run_cli(json_path, src, dest, summary_path, extra):
+    """
+    Runs log2exif.py in a new process and returns its summary dict.
+    """
+    cmd = [sys.executable, os.path.join(ROOT, "log2exif.py"), "--timeline", json_path,
+           "--source", src, "--dest", dest, "--no-cache", "--quiet", "--summary", summary_path] + extra
+    subprocess.run(cmd, check=False, cwd=ROOT)
+    with open(summary_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, nargs="+", default=[2000, 20000], help="Archive sizes to compare")
+    parser.add_argument("--points", type=int, default=100000, help="Timeline points")
+    parser.add_argument("--incremental", action="store_true", help="Run twice with a manifest (second run skips)")
+    parser.add_argument("--apply-clock-offset", action="store_true",
+                        help="Estimate and apply the camera clock offset (photos wait for every capture time)")
+    parser.add_argument("--no-low-memory", dest="low_memory", action="store_false",
+                        help="Measure the default mode instead of --low-memory")
+    parser.add_argument("--max-growth", type=float, help="Allowed peak memory growth in MB")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="log2exif_mem_")
+    extra = ["--low-memory" if args.low_memory else "--no-low-memory"]
+    if args.incremental:
+        extra.append("--incremental")
+    extra.append("--apply-clock-offset" if args.apply_clock_offset else "--no-apply-clock-offset")
+    peaks = []
+    try:
+        json_path = os.path.join(work, "Timeline.json")
+        write_timeline_json(json_path, args.points, START, step_seconds=10)
+        for count in sorted(args.photos):
+            src = os.path.join(work, f"src_{count}")
+            dest = os.path.join(work, f"dest_{count}")
+            photo_step = max(1, args.points * 10 // max(count, 1))
+            make_photo_tree(src, count, START, step_seconds=photo_step, gps_every=10, no_exif_every=20)
+            summary_path = os.path.join(work, f"summary_{count}.json")
+            summary = run_cli(json_path, src, dest, summary_path, extra)
+            if args.incremental:
+                summary = run_cli(json_path, src, dest, summary_path, extra)
+            peak = summary.get("metrics", {}).get("peak_memory_mb")
+            peaks.append(peak)
+            shown = f"{peak:.1f} MB" if peak is not None else "n/a"
+            print(f"{count:>10} photos  processed {summary.get('processed', 0):>10}  "
+                  f"skipped {summary.get('skipped', 0):>10}  peak memory {shown}")
+            shutil.rmtree(src, ignore_errors=True)
+            shutil.rmtree(dest, ignore_errors=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    if args.max_growth is not None and None not in peaks and len(peaks) > 1:
+        growth = peaks[-1] - peaks[0]
+        print(f"growth {growth:+.1f} MB (limit {args.max_growth} MB)")
+        if growth > args.max_growth:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+High-latency storage benchmark: runs the pipeline against a throttled
+stand-in for a network drive with each --workers count, then with the
+default count, and compares them.
+
+    python benchmarks/bench_network_io.py
+    python benchmarks/bench_network_io.py --latency-ms 20 --bandwidth-mb 50 --photos 200
+    python benchmarks/bench_network_io.py --workers 2 8 --min-speedup 3
+    python benchmarks/bench_network_io.py --io-buffer 64
+
+Every open, read and write of a file under the source and destination folders
+goes through one shared link: each request waits --latency-ms for its round
+trip, and the data of all requests shares --bandwidth-mb. Reads are fetched in
+64KB blocks, writes are sent as they come and waited for when the file is
+closed, like an SMB/NFS client. Metadata calls (stat, mkdir, utime) are not
+throttled. Unchanged photos are copied through the process (--transfer copy),
+since kernel copies would bypass the stand-in.
+While one request waits for its round trip the link idles, so the job is
+latency bound until enough workers have requests in flight; link usage shows
+how close each run gets to bandwidth bound.
+With --io-buffer, the default count is also run with read-ahead (see Pipeline).
+Exits with code 1 if the default count is less than --min-speedup times
+faster than the first --workers count.
+"""
+import argparse
+import builtins
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import make_photo_tree
+
+from src.gps_utils import TimelineIndex
+from src.pipeline import Pipeline, default_workers
+from src.transfer import TRANSFER_COPY
+
+START = datetime.datetime(2025, 10, 1, 8, 0, 0)
+# Bytes fetched per read request
+READ_BLOCK = 64 * 1024
+
+class Link:
+    """
+    A network link shared by all requests: round trips take latency seconds,
+    and data moves at bandwidth bytes per second, one request after another.
+    """
+    def __init__(self, latency, bandwidth):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.lock = threading.Lock()
+        self.free_at = 0.0
+        self.bytes = 0
+
+    def send(self, size):
+        """
+        Queues size bytes on the link and returns the time they are through.
+        """
+        with self.lock:
+            start = max(time.perf_counter(), self.free_at)
+            self.free_at = start + size / self.bandwidth
+            self.bytes += size
+            return self.free_at
+
+    def wait(self, until):
+        delay = until + self.latency - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def request(self, size=0):
+        """
+        One round trip carrying size bytes.
+        """
+        self.wait(self.send(size))
+
+class ThrottledFile:
+    """
+    Wraps an open binary file so its reads and writes go through a Link.
+    """
+    def __init__(self, f, link):
+        self._f = f
+        self._link = link
+        self._fetched = 0
+        self._sent = 0.0
+        link.request()  # open
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        end = self._f.tell()
+        if end > self._fetched:
+            block = max(end - self._fetched, READ_BLOCK)
+            self._link.request(block)
+            self._fetched += block
+        return data
+
+    def write(self, data):
+        self._sent = self._link.send(len(data))
+        return self._f.write(data)
+
+    def writelines(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+
+    def close(self):
+        if self._sent:
+            # Written data must be through before close returns
+            self._link.wait(self._sent)
+            self._sent = 0.0
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+def throttled(link, roots, func):
+    """
+    Runs func() with every binary open of a file under roots going through link.
+    """
+    real_open = builtins.open
+    roots = tuple(os.path.abspath(root) + os.sep for root in roots)
+
+    def throttled_open(file, mode="r", *args, **kwargs):
+        f = real_open(file, mode, *args, **kwargs)
+        if "b" in mode and isinstance(file, (str, os.PathLike)) and os.path.abspath(file).startswith(roots):
+            return ThrottledFile(f, link)
+        return f
+
+    builtins.open = throttled_open
+    try:
+        return func()
+    finally:
+        builtins.open = real_open
+
+def run(name, index, src, dest, link, **options):
+    shutil.rmtree(dest, ignore_errors=True)
+    pipeline = Pipeline(index, src, dest, transfer_mode=TRANSFER_COPY, **options)
+    sent_before = link.bytes
+    began = time.perf_counter()
+    processed = throttled(link, (src, dest), pipeline.run)
+    seconds = time.perf_counter() - began
+    moved = (link.bytes - sent_before) / (1024 * 1024)
+    usage = moved / seconds / (link.bandwidth / (1024 * 1024))
+    print(f"{name:<28} {processed:>6} photos {seconds:>8.2f}s {processed / seconds:>8.1f} photos/s  "
+          f"{moved:>7.1f} MB  link {usage:>4.0%}")
+    return seconds
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=200)
+    parser.add_argument("--size", type=int, default=800, help="Photo width in pixels (random content, 4:3)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Round trip time of the stand-in")
+    parser.add_argument("--bandwidth-mb", type=float, default=50, help="Link bandwidth in MB/s")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 8],
+                        help="Worker counts to compare with the default count")
+    parser.add_argument("--io-buffer", type=float, default=0, metavar="MB",
+                        help="Also run the default count with this much read-ahead memory")
+    parser.add_argument("--serial", action="store_true", help="Also time a single-threaded run")
+    parser.add_argument("--min-speedup", type=float,
+                        help="Required speedup of the default count over the first --workers count")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="log2exif_netio_")
+    try:
+        src = os.path.join(work, "src")
+        dest = os.path.join(work, "dest")
+        make_photo_tree(src, args.photos, START, gps_every=10, no_exif_every=25,
+                        size=(args.size, args.size * 3 // 4), noise=True)
+        # Every other photo is further than max_gap from the timeline, so it is copied unchanged
+        index = TimelineIndex.from_points(
+            (START + datetime.timedelta(minutes=i), 35.0 + i * 1e-4, 139.0) for i in range(0, args.photos, 2)
+        )
+        size_mb = sum(e.stat().st_size for d in os.scandir(src) for e in os.scandir(d.path)) / (1024 * 1024)
+        link = Link(args.latency_ms / 1000, args.bandwidth_mb * 1024 * 1024)
+        print(f"{args.photos} photos, {size_mb:.1f} MB; link {args.latency_ms:g} ms, {args.bandwidth_mb:g} MB/s "
+              f"(best case {2 * size_mb / args.bandwidth_mb:.2f}s to read and write everything)")
+
+        options = {"max_gap": 30}
+        if args.serial:
+            run("serial", index, src, dest, link, workers=1, **options)
+        seconds = []
+        for workers in args.workers:
+            seconds.append(run(f"{workers} workers", index, src, dest, link, workers=workers, **options))
+        # workers=None is what a run without --workers gets
+        seconds.append(run(f"default ({default_workers()} workers)", index, src, dest, link,
+                           workers=None, **options))
+        speedup = seconds[0] / seconds[-1]
+        print(f"speedup {speedup:.2f}x")
+        if args.io_buffer:
+            buffered = run(f"default + {args.io_buffer:g} MB read-ahead", index, src, dest, link, workers=None,
+                           io_buffer=int(args.io_buffer * 1024 * 1024), **options)
+            print(f"read-ahead speedup over default {seconds[-1] / buffered:.2f}x")
+        if args.min_speedup is not None and speedup < args.min_speedup:
+            return 1
+        return 0
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Cold-start benchmark for the GUI, each measurement in a fresh process:
+- import time of main.py and its slowest modules (python -X importtime)
+- wall time from process start until the first window has been drawn
+- modules that must not be loaded before the window appears
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-seconds 1.0]
+    python benchmarks/bench_startup.py --exe dist/Log2Exif.exe
+
+main.py is timed by a probe that runs main.main() with mainloop closing the
+window as soon as it has been drawn. --exe times a frozen build instead,
+until its window shows up (Windows only); the build itself has no hook for
+this. Exits with code 1 if the median time to the first window exceeds
+--max-seconds, or if a heavy module was imported before the window appeared.
+Requires tkinter and a display.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from synthetic import ROOT
+
+# Must only be imported once a run starts
+HEAVY_MODULES = ("PIL", "piexif", "sqlite3", "concurrent.futures",
+                 "src.processor", "src.pipeline", "src.image_utils", "src.timeline_formats")
+# Title of the main window, looked up to time a frozen build
+WINDOW_TITLE = "Log2Exif"
+# Seconds between two looks for the window of a frozen build
+WINDOW_POLL_INTERVAL = 0.005
+WINDOW_TIMEOUT = 60.0
+
+# Opens the window like main.py and lists the heavy modules loaded by then
+_PROBE = (
+    "import sys, tkinter as tk\n"
+    "from src.gui import App\n"
+    "root = tk.Tk(); App(root); root.update()\n"
+    "print(','.join(m for m in {modules!r} if m in sys.modules))\n"
+    "root.destroy()\n"
+)
+
+# Starts the GUI through main.main(); instead of running the event loop,
+# mainloop draws the window once and closes it
+_MAIN_PROBE = (
+    "import tkinter as tk\n"
+    "def close_after_start(root, n=0):\n"
+    "    root.update()\n"
+    "    root.destroy()\n"
+    "tk.Tk.mainloop = close_after_start\n"
+    "import main\n"
+    "main.main()\n"
+)
+
+def time_to_window():
+    """
+    Starts main.py in a new process and returns the seconds until its first window was drawn.
+    """
+    began = time.perf_counter()
+    subprocess.run([sys.executable, "-c", _MAIN_PROBE], cwd=ROOT, check=True)
+    return time.perf_counter() - began
+
+def exe_time_to_window(exe):
+    """
+    Starts a frozen build and returns the seconds until its window is visible.
+    The process is terminated afterwards.
+    """
+    import ctypes
+    user32 = ctypes.windll.user32
+    began = time.perf_counter()
+    proc = subprocess.Popen([exe], cwd=ROOT)
+    try:
+        while time.perf_counter() - began < WINDOW_TIMEOUT:
+            hwnd = user32.FindWindowW(None, WINDOW_TITLE)
+            if hwnd and user32.IsWindowVisible(hwnd):
+                return time.perf_counter() - began
+            if proc.poll() is not None:
+                raise RuntimeError(f"{exe} exited with code {proc.returncode} before its window appeared")
+            time.sleep(WINDOW_POLL_INTERVAL)
+        raise RuntimeError(f"No window from {exe} within {WINDOW_TIMEOUT:g}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def import_times(top=10):
+    """
+    Returns (total microseconds for main.py, [(cumulative us, module)] slowest first).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line.split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue  # header line
+        name = parts[2].rstrip()
+        if name.strip() == "main":
+            total = cumulative
+        rows.append((cumulative, name))
+    rows.sort(reverse=True)
+    return total, rows[:top]
+
+def heavy_modules_before_window():
+    result = subprocess.run([sys.executable, "-c", _PROBE.format(modules=HEAVY_MODULES)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Launches to time (the median is reported)")
+    parser.add_argument("--exe", help="Time a frozen build instead of main.py")
+    parser.add_argument("--max-seconds", type=float, help="Fail if the median time to the first window is higher")
+    args = parser.parse_args(argv)
+
+    failed = False
+    if not args.exe:
+        total, rows = import_times()
+        print(f"import main: {total / 1000:.1f} ms")
+        for cumulative, name in rows:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+        heavy = heavy_modules_before_window()
+        if heavy:
+            print(f"loaded before the first window: {', '.join(heavy)}")
+            failed = True
+
+    if args.exe and sys.platform != "win32":
+        parser.error("--exe is only supported on Windows")
+    times = [exe_time_to_window(args.exe) if args.exe else time_to_window() for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f"time to first window: median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s ({args.runs} runs)")
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"slower than {args.max_seconds}s")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
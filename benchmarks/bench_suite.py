@@ -0,0 +1,144 @@
+"""
+Synthetic benchmark suite for the hot paths: timeline loading, matching,
+timestamp reads, EXIF writing and a full end-to-end run.
+
+    python benchmarks/bench_suite.py --points 100000 --photos 1000
+    python benchmarks/bench_suite.py --save-baseline baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --tolerance 0.2
+
+With --baseline, exits with code 1 if any benchmark's throughput dropped by
+more than --tolerance compared to the saved results.
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from synthetic import make_photo_tree, write_timeline_json
+
+from src.gps_utils import find_nearest_point
+from src.timeline_formats import load_timeline_points
+from src.image_utils import add_gps_to_exif, get_image_timestamp
+from src.processor import run_job
+from src.progress import peak_memory_mb
+
+START = datetime.datetime(2025, 1, 1, 0, 0, 0)
+
+def measure(name, items, func):
+    """
+    Times func() and returns a result row; items is the work count for throughput.
+    """
+    began = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - began
+    row = {
+        "name": name,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 1) if seconds > 0 else None,
+        "peak_rss_mb": peak_memory_mb(),
+    }
+    rss = f"{row['peak_rss_mb']:.0f}MB" if row["peak_rss_mb"] is not None else "n/a"
+    print(f"{name:<24} {items:>10} items {seconds:>9.3f}s {row['throughput'] or 0:>12.1f}/s  peak RSS {rss}")
+    return row
+
+def run_benchmarks(work, points, photos):
+    json_path = os.path.join(work, "Timeline.json")
+    src = os.path.join(work, "src")
+    step = 10
+    write_timeline_json(json_path, points, START, step_seconds=step)
+    # Spread photos over the timeline span
+    photo_step = max(1, points * step // max(photos, 1))
+    paths = make_photo_tree(src, photos, START, step_seconds=photo_step, gps_every=10, no_exif_every=20)
+
+    results = []
+    holder = {}
+
+    def load():
+        holder["index"] = load_timeline_points(json_path)
+    results.append(measure("load_timeline_points", points, load))
+
+    index = holder["index"]
+    times = [START + datetime.timedelta(seconds=i * photo_step + 3) for i in range(photos)]
+    lookups = max(photos, 100000)
+    queries = [times[i % len(times)] for i in range(lookups)]
+
+    def nearest():
+        for t in queries:
+            find_nearest_point(t, index)
+    results.append(measure("find_nearest_point", lookups, nearest))
+    results.append(measure("lookup_many", lookups, lambda: index.lookup_many(queries)))
+
+    def timestamps():
+        for p in paths:
+            get_image_timestamp(p)
+    results.append(measure("get_image_timestamp", photos, timestamps))
+
+    dest = os.path.join(work, "dest_exif")
+
+    def write():
+        for p in paths:
+            add_gps_to_exif(p, 35.0, 139.0, dest, overwrite=True)
+    results.append(measure("add_gps_to_exif", photos, write))
+
+    dest = os.path.join(work, "dest_run")
+    results.append(measure("end_to_end", photos,
+                           lambda: run_job(json_path, src, dest, use_cache=False)))
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the change against baseline and returns the names that regressed.
+    """
+    previous = {row["name"]: row for row in baseline.get("results", [])}
+    regressions = []
+    print("\nComparison with baseline:")
+    for row in results:
+        old = previous.get(row["name"])
+        if not old or not old.get("throughput") or not row["throughput"]:
+            continue
+        change = row["throughput"] / old["throughput"] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            regressions.append(row["name"])
+        print(f"{row['name']:<24} {old['throughput']:>12.1f}/s -> {row['throughput']:>12.1f}/s ({change:+.1%}){flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000, help="Timeline points (10k - 10M)")
+    parser.add_argument("--photos", type=int, default=1000, help="Synthetic JPEGs")
+    parser.add_argument("--baseline", help="Compare against results saved with --save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Save these results as a baseline")
+    parser.add_argument("--workdir", help="Directory for the synthetic data (default: temporary)")
+    args = parser.parse_args(argv)
+
+    work = args.workdir or tempfile.mkdtemp(prefix="log2exif_bench_")
+    os.makedirs(work, exist_ok=True)
+    try:
+        results = run_benchmarks(work, args.points, args.photos)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(work, ignore_errors=True)
+
+    report = {"points": args.points, "photos": args.photos, "results": results}
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Regression check for the built-in streaming JSON reader (used by the timeline
+loaders when ijson is not installed): a Timeline document is read with every
+chunk size from 1 byte up to its full length, so every value, including
+numbers like 0.25 or -1.5e-3, is cut at every possible chunk boundary once.
+The skipped top-level values and the timeline segments must match json.loads.
+
+    python benchmarks/check_json_stream.py
+
+Exits with code 1 on the first chunk size that gives a different result.
+"""
+import io
+import json
+import sys
+
+from synthetic import ROOT  # noqa: F401 (puts the repository on sys.path)
+
+from src.json_stream import JsonStream
+
+DOCUMENT = json.dumps({
+    "userLocationProfile": {
+        "frequentPlaces": [{"placeId": "a", "placeLocation": "35.0°, 139.0°", "label": "HOME"}],
+        "persona": {"travelModeAffinities": [{"mode": "WALKING", "affinity": 0.25},
+                                             {"mode": "IN_PASSENGER_VEHICLE", "affinity": 1.5e-3}]},
+        "score": -12.75, "count": 1234567, "flag": True, "none": None,
+    },
+    "semanticSegments": [
+        {"startTime": "2025-01-01T08:00:00.000+09:00", "endTime": "2025-01-01T08:10:00.000+09:00",
+         "probability": 0.875, "distanceMeters": 1.0e3,
+         "timelinePath": [{"point": "35.6812°, 139.7671°", "time": "2025-01-01T08:00:00.000+09:00"},
+                          {"point": "-33.8688°, -151.2093°", "time": "2025-01-01T08:05:00.000+09:00"}]},
+        {"startTime": "2025-01-01T09:00:00.000+09:00", "endTime": "2025-01-01T10:00:00.000+09:00",
+         "visit": {"probability": 0.5, "topCandidate": {"placeLocation": {"latLng": "35.0°, 139.0°"}}}},
+    ],
+    "rawSignals": [{"position": {"accuracyMeters": 12, "altitudeMeters": 40.5, "speedMetersPerSecond": 0.0}}],
+}, ensure_ascii=False, indent=1)
+
+def read(chunk_size):
+    """
+    Walks DOCUMENT like the loaders: skips every top-level value except
+    semanticSegments. userLocationProfile is walked key by key like
+    skip_value does, but its values are kept to compare them.
+    """
+    stream = JsonStream(io.StringIO(DOCUMENT), chunk_size)
+    result = {}
+    for name in stream.iter_object():
+        if name == "semanticSegments":
+            result[name] = list(stream.iter_array())
+        elif name == "userLocationProfile":
+            result[name] = {key: stream.decode_value() for key in stream.iter_object()}
+        else:
+            stream.skip_value()
+    return result
+
+def main():
+    expected = json.loads(DOCUMENT)
+    expected = {key: expected[key] for key in ("userLocationProfile", "semanticSegments")}
+    for chunk_size in range(1, len(DOCUMENT) + 1):
+        try:
+            result = read(chunk_size)
+        except ValueError as e:
+            print(f"FAIL: chunk size {chunk_size}: {e}")
+            return 1
+        if result != expected:
+            print(f"FAIL: chunk size {chunk_size}: decoded values differ")
+            return 1
+    print(f"OK ({len(DOCUMENT)} chunk sizes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
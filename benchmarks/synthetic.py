@@ -0,0 +1,85 @@
+import datetime
+import os
+import sys
+
+# Allow running the benchmarks as plain scripts from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from PIL import Image
+import piexif
+
+def make_jpeg(path, timestamp=None, gps=None, size=(64, 64), noise=False):
+    """
+    Writes a small JPEG. timestamp sets DateTimeOriginal, gps=(lat, lon) adds GPS tags.
+    With noise, the pixels are random so the file is about as large as a photo of that size.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if noise:
+        img = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        img = Image.new('RGB', size, color='red')
+
+    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    if timestamp is not None:
+        exif_dict["Exif"][36867] = timestamp.strftime("%Y:%m:%d %H:%M:%S").encode('utf-8')
+    if gps is not None:
+        from src.image_utils import to_deg
+        lat_deg = to_deg(gps[0], ["N", "S"])
+        lon_deg = to_deg(gps[1], ["E", "W"])
+        exif_dict["GPS"] = {1: lat_deg[1].encode('utf-8'), 2: lat_deg[0],
+                            3: lon_deg[1].encode('utf-8'), 4: lon_deg[0]}
+
+    img.save(path, "jpeg", exif=piexif.dump(exif_dict))
+
+def make_photo_tree(folder, count, start, step_seconds=60, per_dir=100, gps_every=0, no_exif_every=0,
+                    size=(64, 64), noise=False):
+    """
+    Writes `count` JPEGs under folder, per_dir per sub folder, with capture
+    times starting at `start` and `step_seconds` apart. Every gps_every-th
+    photo already has GPS and every no_exif_every-th photo has no EXIF at all
+    (0 = none). size and noise are passed to make_jpeg. Returns the list of paths.
+    """
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"d{i // per_dir:04d}", f"IMG_{i:06d}.jpg")
+        if no_exif_every and i % no_exif_every == 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            Image.new('RGB', size, color='red').save(path, "jpeg")
+        else:
+            ts = start + datetime.timedelta(seconds=i * step_seconds)
+            gps = (35.0, 139.0) if gps_every and i % gps_every == 0 else None
+            make_jpeg(path, ts, gps, size, noise)
+        paths.append(path)
+    return paths
+
+def write_timeline_json(path, count, start, step_seconds=10, points_per_segment=100):
+    """
+    Writes a synthetic Google Timeline export with `count` timelinePath points,
+    `step_seconds` apart, grouped into semanticSegments. Each segment also has a
+    visit entry, like real exports. Written incrementally, so 10M points is fine.
+    """
+    tz = datetime.timezone(datetime.timedelta(hours=9))
+    t0 = start.replace(tzinfo=tz)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"semanticSegments": [')
+        for seg_start in range(0, count, points_per_segment):
+            if seg_start:
+                f.write(",")
+            seg_end = min(count, seg_start + points_per_segment)
+            seg_t0 = t0 + datetime.timedelta(seconds=seg_start * step_seconds)
+            seg_t1 = t0 + datetime.timedelta(seconds=(seg_end - 1) * step_seconds)
+            f.write(f'{{"startTime": "{seg_t0.isoformat(timespec="milliseconds")}", '
+                    f'"endTime": "{seg_t1.isoformat(timespec="milliseconds")}", '
+                    f'"visit": {{"topCandidate": {{"placeLocation": {{"latLng": "35.0°, 139.0°"}}}}}}, '
+                    '"timelinePath": [')
+            for i in range(seg_start, seg_end):
+                t = t0 + datetime.timedelta(seconds=i * step_seconds)
+                lat = 35.0 + (i % 10000) * 1e-5
+                lon = 139.0 + (i // 10000 % 10000) * 1e-5
+                sep = "," if i > seg_start else ""
+                f.write(f'{sep}{{"point": "{lat:.7f}°, {lon:.7f}°", '
+                        f'"time": "{t.isoformat(timespec="milliseconds")}"}}')
+            f.write("]}")
+        f.write("]}")
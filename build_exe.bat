@@ -17,8 +17,15 @@ if errorlevel 1 (
     )
 )
 
+REM "build_exe.bat lean" builds the lean profile (see Log2Exif.spec)
+if /i "%~1"=="lean" (
+    set LOG2EXIF_BUILD=lean
+) else (
+    set LOG2EXIF_BUILD=
+)
+
 echo Building EXE with PyInstaller...
-python -m PyInstaller Log2Exif.spec
+python -m PyInstaller --noconfirm Log2Exif.spec
 
 if errorlevel 1 (
     echo.
@@ -32,6 +39,10 @@ echo ========================================
 echo Build completed successfully!
 echo ========================================
 echo.
-echo The executable file is located at: dist\Log2Exif.exe
+if /i "%~1"=="lean" (
+    echo The executable file is located at: dist\Log2Exif\Log2Exif.exe
+) else (
+    echo The executable file is located at: dist\Log2Exif.exe
+)
 echo.
 pause
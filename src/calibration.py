@@ -0,0 +1,95 @@
+import bisect
+import math
+from array import array
+
+# Largest camera clock error searched, in seconds (a camera left on home time
+# can be off by a whole time zone difference)
+MAX_CLOCK_OFFSET = 14 * 60 * 60
+# Search levels, coarse to fine: (step in seconds, photos sampled; 0 = all).
+# Each level searches +-one step of the previous level around its best offset.
+SEARCH_LEVELS = ((15 * 60, 2000), (60, 10000), (5, 0))
+# Offsets whose cost is within this fraction of the best are treated as equally good
+COST_TOLERANCE = 0.02
+
+def _sample(values, size):
+    """
+    Returns about size evenly spaced values from a sorted array (all if size is 0).
+    """
+    if not size or len(values) <= size:
+        return values
+    stride = len(values) / size
+    return array('d', (values[int(i * stride)] for i in range(size)))
+
+def _gaps(times, photos, offset):
+    """
+    Yields the time from each photo (shifted by offset) to its nearest timeline point.
+    photos must be sorted, so every search starts where the previous one ended.
+    """
+    n = len(times)
+    bisect_left = bisect.bisect_left
+    lo = 0
+    for p in photos:
+        t = p + offset
+        lo = bisect_left(times, t, lo)
+        gap = times[lo] - t if lo < n else math.inf
+        if lo > 0 and t - times[lo - 1] < gap:
+            gap = t - times[lo - 1]
+        yield gap
+
+def offset_cost(times, photos, offset, cap):
+    """
+    Sum of the gaps between photos shifted by offset and the timeline, each
+    capped at cap so photos far from any point (e.g. outside the timeline) do
+    not outweigh the rest.
+    """
+    return sum(gap if gap < cap else cap for gap in _gaps(times, photos, offset))
+
+def median_gap(times, photos, offset=0.0):
+    """
+    Median time in seconds between the photos and their nearest timeline point.
+    """
+    gaps = sorted(_gaps(times, photos, offset))
+    return gaps[len(gaps) // 2] if gaps else None
+
+def estimate_clock_offset(index, utc_times, max_offset=MAX_CLOCK_OFFSET):
+    """
+    Estimates the camera clock error over a whole batch of photos.
+    utc_times are the photos' capture times resolved to UTC (see
+    TimelineIndex.resolve_local_times). Returns the offset in seconds to add to
+    them that best aligns the batch with the timeline: the searched offsets are
+    scored by their total capped gap, coarse to fine on growing samples of the
+    batch, so only the last few candidates look at every photo.
+    Returns None if there are no photos or timeline points.
+    """
+    if not len(index) or not len(utc_times):
+        return None
+    times = index.times
+    photos = array('d', sorted(utc_times))
+
+    best, radius = 0.0, max_offset
+    for step, sample_size in SEARCH_LEVELS:
+        sample = _sample(photos, sample_size)
+        span = int(math.ceil(radius / step))
+        candidates = [best + k * step for k in range(-span, span + 1)]
+        costs = [offset_cost(times, sample, offset, 2 * step) for offset in candidates]
+        # Differences within the noise of the timeline's sampling interval go
+        # to the candidate closest to the previous level's result (first: no correction)
+        limit = min(costs) * (1 + COST_TOLERANCE)
+        anchor = best
+        best = min((offset for offset, cost in zip(candidates, costs) if cost <= limit),
+                   key=lambda offset: abs(offset - anchor))
+        radius = step
+    return best
+
+def clock_offset_report(index, utc_times, offset):
+    """
+    Summary of an estimated offset: median gaps before and after applying it.
+    """
+    times = index.times
+    photos = array('d', sorted(utc_times))
+    return {
+        "offset_seconds": offset,
+        "photos": len(photos),
+        "median_gap_before": median_gap(times, photos),
+        "median_gap_after": median_gap(times, photos, offset),
+    }
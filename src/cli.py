@@ -0,0 +1,127 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+from .config import Config
+from .gps_utils import MATCH_MODES
+from .processor import ProcessingError, run_job
+from .report import format_histogram
+from .transfer import TRANSFER_MODES
+
+# Seconds between progress lines on stderr
+PROGRESS_INTERVAL = 2.0
+
+def build_parser(config):
+    parser = argparse.ArgumentParser(
+        prog="log2exif",
+        description="Add GPS data from a Google Maps Timeline export to photo EXIF (no GUI).",
+    )
+    parser.add_argument("--timeline", nargs="+", default=config.json_path, metavar="PATH",
+                        help="Timeline files or folders: Timeline JSON, Records.json, Semantic Location History, "
+                             "GPX; several sources are merged (default: value saved in config.json)")
+    parser.add_argument("--source", default=config.source_folder,
+                        help="Source images folder (default: value saved in config.json)")
+    parser.add_argument("--dest", default=config.dest_folder,
+                        help="Destination folder (default: value saved in config.json)")
+    parser.add_argument("--overwrite", action=argparse.BooleanOptionalAction, default=config.overwrite,
+                        help="Overwrite existing GPS data")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=config.incremental,
+                        help="Skip photos already processed into the destination by an earlier run")
+    parser.add_argument("--match-mode", choices=MATCH_MODES, default=config.match_mode,
+                        help="nearest point, or interpolation between the bracketing points")
+    parser.add_argument("--max-gap", type=float, default=config.max_gap_minutes, metavar="MINUTES",
+                        help="Leave photos unmatched when the timeline has no point within this many minutes (0 = unlimited)")
+    parser.add_argument("--camera-utc-offset", type=float, default=config.camera_utc_offset, metavar="HOURS",
+                        help="UTC offset the camera clock is set to, e.g. 9 (default: use the timeline's time zone at each photo)")
+    parser.add_argument("--estimate-clock-offset", action="store_true",
+                        help="Estimate how far the camera clock is off from the timeline and report it")
+    parser.add_argument("--apply-clock-offset", action=argparse.BooleanOptionalAction,
+                        default=config.apply_clock_offset, help="Estimate the camera clock offset and correct all photos by it")
+    parser.add_argument("--transfer", choices=TRANSFER_MODES, default=config.transfer_mode,
+                        help="How photos that are not modified reach the destination (move removes the source)")
+    parser.add_argument("--workers", type=int, default=config.workers,
+                        help="Worker threads per I/O stage (0 = automatic: 32, since they mostly wait on storage)")
+    parser.add_argument("--scan-workers", type=int, default=config.scan_workers,
+                        help="Threads listing source subfolders in parallel (helps on network drives)")
+    parser.add_argument("--io-buffer", type=float, default=config.io_buffer_mb, metavar="MB",
+                        help="Read photos that get GPS ahead into memory, up to this many MB, so reads "
+                             "overlap writes on network drives (0 = off)")
+    parser.add_argument("--low-memory", action=argparse.BooleanOptionalAction, default=config.low_memory,
+                        help="Keep memory use independent of the archive size (slower incremental checks)")
+    parser.add_argument("--compact", action=argparse.BooleanOptionalAction, default=config.compact_timeline,
+                        help="Drop timeline points that do not change matching (stays, dense straight tracks)")
+    parser.add_argument("--compact-meters", type=float, default=config.compact_meters, metavar="METERS",
+                        help="Largest position error compaction may introduce")
+    parser.add_argument("--compact-seconds", type=float, default=config.compact_seconds, metavar="SECONDS",
+                        help="Longest time between two timeline points kept by compaction")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Always re-parse the timeline JSON instead of using the compiled cache")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only match photos and report what would be done; nothing is written")
+    parser.add_argument("--report", metavar="PATH",
+                        help="Write a per-photo CSV report (capture time, matched time, delta, lat/lon, action)")
+    parser.add_argument("--summary", metavar="PATH", default="-",
+                        help="Write the JSON summary to PATH ('-' = stdout)")
+    parser.add_argument("--quiet", action="store_true",
+                        help="Do not print progress to stderr")
+    return parser
+
+def write_summary(summary, path):
+    text = json.dumps(summary, indent=4, ensure_ascii=False)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+def main(argv=None):
+    """
+    Command line entry point. Returns the process exit code:
+    0 = success, 1 = job failed or some photos could not be processed.
+    """
+    args = build_parser(Config.load()).parse_args(argv)
+
+    def log(text):
+        if not args.quiet:
+            print(text, file=sys.stderr)
+
+    def progress(done, total, path):
+        # total is None while the source folder is still being scanned
+        log(f"Processing {done}/{total if total is not None else '?'}: {os.path.basename(path)}")
+
+    # stdout carries only the JSON summary; anything else printed while the
+    # job runs is a diagnostic and goes to stderr
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = run_job(args.timeline, args.source, args.dest, args.overwrite, args.workers,
+                              on_status=log, on_progress=progress, progress_interval=PROGRESS_INTERVAL,
+                              use_cache=args.use_cache, incremental=args.incremental,
+                              match_mode=args.match_mode, max_gap_minutes=args.max_gap,
+                              camera_utc_offset=args.camera_utc_offset, transfer_mode=args.transfer,
+                              scan_workers=args.scan_workers, dry_run=args.dry_run, report_path=args.report,
+                              estimate_clock=args.estimate_clock_offset, apply_clock=args.apply_clock_offset,
+                              low_memory=args.low_memory, compact=args.compact,
+                              compact_meters=args.compact_meters, compact_seconds=args.compact_seconds,
+                              io_buffer_mb=args.io_buffer)
+    except ProcessingError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        write_summary({"status": "error", "error": str(e)}, args.summary)
+        return 1
+    except Exception as e:
+        # Unexpected failures (e.g. an unusable --dest for the manifest) still
+        # leave a summary for scripts that read it
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        write_summary({"status": "error", "error": f"{type(e).__name__}: {e}"}, args.summary)
+        return 1
+
+    if "delta_histogram" in summary:
+        log("Time to nearest timeline point:\n" + format_histogram(summary["delta_histogram"]))
+    summary["status"] = "ok" if summary["failed"] == 0 else "partial"
+    write_summary(summary, args.summary)
+    peak = summary["metrics"]["peak_memory_mb"]
+    log(f"Done! Processed {summary['processed']} images." + (f" Peak memory {peak:.0f} MB." if peak else ""))
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import math
+from array import array
+from .gps_utils import TimelineIndex
+
+# Default tolerances: largest position error a dropped point may get (metres),
+# and longest time between two kept points (seconds), so a photo's nearest
+# point never moves further away in time than half of it
+COMPACT_METERS = 10.0
+COMPACT_SECONDS = 300.0
+# Metres per degree of latitude (mean Earth radius)
+_METERS_PER_DEGREE = 6371008.8 * math.pi / 180
+
+def distance_m(lat0, lon0, lat1, lon1):
+    """
+    Approximate distance in metres between two points (equirectangular,
+    accurate at the scale of the tolerances).
+    """
+    dlon = lon1 - lon0
+    if dlon > 180:
+        dlon -= 360
+    elif dlon < -180:
+        dlon += 360
+    x = dlon * math.cos(math.radians((lat0 + lat1) / 2))
+    return math.hypot(x, lat1 - lat0) * _METERS_PER_DEGREE
+
+def _chunks(times, max_seconds):
+    """
+    Yields (first, last) index ranges covering times, each spanning at most
+    max_seconds (or two points across a longer gap); neighbours share an endpoint.
+    """
+    n = len(times)
+    first = 0
+    while first < n - 1:
+        limit = times[first] + max_seconds
+        last = first + 1
+        while last + 1 < n and times[last + 1] <= limit:
+            last += 1
+        yield first, last
+        first = last
+
+def _is_stationary(lats, lons, first, last, radius):
+    """
+    True if every point from first to last is within radius metres of the first one.
+    """
+    lat0, lon0 = lats[first], lons[first]
+    return all(distance_m(lat0, lon0, lats[i], lons[i]) <= radius for i in range(first + 1, last + 1))
+
+def _simplify(times, lats, lons, first, last, meters, keep):
+    """
+    Time-aware Douglas-Peucker on one range: marks in keep the points needed so
+    that every dropped point is within meters of the position interpolated at
+    its time between the kept points around it (synchronized distance) and of
+    both of those kept points, i.e. of what either match mode returns: in
+    nearest mode a photo near a dropped point gets whichever of the two is
+    nearer in time to the photo, which may be the one further from the point.
+    """
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        keep[a] = keep[b] = 1
+        if b - a < 2:
+            continue
+        ta, tb = times[a], times[b]
+        lat_a, lon_a, lat_b, lon_b = lats[a], lons[a], lats[b], lons[b]
+        span = tb - ta
+        worst, worst_error = None, meters
+        for i in range(a + 1, b):
+            t = times[i]
+            f = (t - ta) / span if span > 0 else 1.0
+            dlon = lon_b - lon_a
+            if dlon > 180:
+                dlon -= 360
+            elif dlon < -180:
+                dlon += 360
+            lat, lon = lats[i], lons[i]
+            error = max(distance_m(lat_a + (lat_b - lat_a) * f, lon_a + dlon * f, lat, lon),
+                        distance_m(lat_a, lon_a, lat, lon), distance_m(lat_b, lon_b, lat, lon))
+            if error > worst_error:
+                worst, worst_error = i, error
+        if worst is not None:
+            stack.append((a, worst))
+            stack.append((worst, b))
+
+def compact_timeline(index, meters=COMPACT_METERS, seconds=COMPACT_SECONDS):
+    """
+    Returns a smaller TimelineIndex that matches photos like index within the
+    tolerances. The timeline is cut into stretches of at most seconds: stretches
+    where the position stays within meters/2 of their start (sitting still) are
+    merged into their two endpoints, the others are simplified with a
+    time-aware line simplification (see _simplify). UTC offset transitions are
+    kept as they are. source_points keeps the point count before compaction.
+    """
+    times, lats, lons = index.times, index.lats, index.lons
+    keep = bytearray(len(times))
+    radius = meters / 2
+    for first, last in _chunks(times, seconds):
+        if _is_stationary(lats, lons, first, last, radius):
+            keep[first] = keep[last] = 1
+        else:
+            _simplify(times, lats, lons, first, last, meters, keep)
+    if len(times) == 1:
+        keep[0] = 1
+
+    compacted = TimelineIndex(array('d', (t for t, k in zip(times, keep) if k)),
+                              array('d', (v for v, k in zip(lats, keep) if k)),
+                              array('d', (v for v, k in zip(lons, keep) if k)),
+                              index.offset_times, index.offsets)
+    compacted.source_points = index.source_points
+    return compacted
@@ -1,5 +1,6 @@
 import json
 import os
+import sys
 
 CONFIG_FILE = "config.json"
 
@@ -9,6 +10,19 @@ class Config:
         self.source_folder = ""
         self.dest_folder = ""
         self.overwrite = False
+        self.workers = 0  # 0 = automatic
+        self.incremental = False
+        self.match_mode = "nearest"  # nearest / linear / great_circle
+        self.max_gap_minutes = 0  # 0 = unlimited
+        self.camera_utc_offset = None  # hours; None = time zone from the timeline
+        self.transfer_mode = "auto"  # auto / copy / copy_file_range / reflink / hardlink / move
+        self.scan_workers = 1  # threads listing source subfolders; >1 helps on network drives
+        self.apply_clock_offset = False  # estimate the camera clock error and correct photos by it
+        self.low_memory = False  # memory independent of archive size, for small machines
+        self.compact_timeline = False  # drop redundant timeline points after loading
+        self.compact_meters = 10.0  # largest position error of a dropped point
+        self.compact_seconds = 300.0  # longest time between two kept points
+        self.io_buffer_mb = 0  # read-ahead memory for network drives; 0 = off
 
     @staticmethod
     def load():
@@ -21,19 +35,69 @@ class Config:
                     config.source_folder = data.get("source_folder", "")
                     config.dest_folder = data.get("dest_folder", "")
                     config.overwrite = data.get("overwrite", False)
+                    config.workers = data.get("workers", 0)
+                    config.incremental = data.get("incremental", False)
+                    config.match_mode = data.get("match_mode", "nearest")
+                    config.max_gap_minutes = data.get("max_gap_minutes", 0)
+                    config.camera_utc_offset = data.get("camera_utc_offset", None)
+                    config.transfer_mode = data.get("transfer_mode", "auto")
+                    config.scan_workers = data.get("scan_workers", 1)
+                    config.apply_clock_offset = data.get("apply_clock_offset", False)
+                    config.low_memory = data.get("low_memory", False)
+                    config.compact_timeline = data.get("compact_timeline", False)
+                    config.compact_meters = data.get("compact_meters", 10.0)
+                    config.compact_seconds = data.get("compact_seconds", 300.0)
+                    config.io_buffer_mb = data.get("io_buffer_mb", 0)
             except Exception as e:
-                print(f"Error loading config: {e}")
+                print(f"Error loading config: {e}", file=sys.stderr)
         return config
 
+    def job_options(self):
+        """
+        Returns the saved settings as keyword arguments for processor.run_job.
+        """
+        return {
+            "json_path": self.json_path,
+            "src_folder": self.source_folder,
+            "dest_folder": self.dest_folder,
+            "overwrite": self.overwrite,
+            "workers": self.workers,
+            "incremental": self.incremental,
+            "match_mode": self.match_mode,
+            "max_gap_minutes": self.max_gap_minutes,
+            "camera_utc_offset": self.camera_utc_offset,
+            "transfer_mode": self.transfer_mode,
+            "scan_workers": self.scan_workers,
+            "apply_clock": self.apply_clock_offset,
+            "low_memory": self.low_memory,
+            "compact": self.compact_timeline,
+            "compact_meters": self.compact_meters,
+            "compact_seconds": self.compact_seconds,
+            "io_buffer_mb": self.io_buffer_mb,
+        }
+
     def save(self):
         data = {
             "json_path": self.json_path,
             "source_folder": self.source_folder,
             "dest_folder": self.dest_folder,
-            "overwrite": self.overwrite
+            "overwrite": self.overwrite,
+            "workers": self.workers,
+            "incremental": self.incremental,
+            "match_mode": self.match_mode,
+            "max_gap_minutes": self.max_gap_minutes,
+            "camera_utc_offset": self.camera_utc_offset,
+            "transfer_mode": self.transfer_mode,
+            "scan_workers": self.scan_workers,
+            "apply_clock_offset": self.apply_clock_offset,
+            "low_memory": self.low_memory,
+            "compact_timeline": self.compact_timeline,
+            "compact_meters": self.compact_meters,
+            "compact_seconds": self.compact_seconds,
+            "io_buffer_mb": self.io_buffer_mb
         }
         try:
             with open(CONFIG_FILE, "w", encoding="utf-8") as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
         except Exception as e:
-            print(f"Error saving config: {e}")
+            print(f"Error saving config: {e}", file=sys.stderr)
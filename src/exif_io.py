@@ -0,0 +1,356 @@
+import shutil
+import struct
+from .transfer import open_replacing
+
+# JPEG markers
+SOI = b"\xff\xd8"
+APP0 = 0xE0
+APP1 = 0xE1
+SOS = 0xDA
+EOI = 0xD9
+
+EXIF_HEADER = b"Exif\x00\x00"
+# Segment length field is 16 bits and includes itself
+MAX_SEGMENT_DATA = 0xFFFF - 2
+
+def read_header_segments(f):
+    """
+    Reads JPEG marker segments from the start of f up to (not including) SOS.
+    Returns a list of (marker, segment_bytes); f is left positioned at SOS.
+    Only the metadata header is read, never the compressed image data.
+    """
+    if f.read(2) != SOI:
+        raise ValueError("Not a JPEG file")
+
+    segments = []
+    while True:
+        pos = f.tell()
+        head = f.read(2)
+        if len(head) < 2 or head[0] != 0xFF:
+            raise ValueError("Broken JPEG marker")
+        marker = head[1]
+        # Skip fill bytes (0xFF 0xFF ...)
+        while marker == 0xFF:
+            b = f.read(1)
+            if not b:
+                raise ValueError("Broken JPEG marker")
+            marker = b[0]
+
+        if marker in (SOS, EOI):
+            f.seek(pos)
+            return segments
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            raise ValueError("Truncated JPEG segment")
+        length = struct.unpack(">H", length_bytes)[0]
+        data = f.read(length - 2)
+        if len(data) < length - 2:
+            raise ValueError("Truncated JPEG segment")
+        segments.append((marker, b"\xff" + bytes([marker]) + length_bytes + data))
+
+def is_exif_segment(marker, segment):
+    """
+    True if the segment is an APP1 Exif segment (not XMP, which is also APP1).
+    """
+    return marker == APP1 and segment[4:10] == EXIF_HEADER
+
+def exif_from_segments(segments):
+    """
+    Returns the Exif payload ("Exif\\0\\0" + TIFF data) among header segments, or b"".
+    """
+    for marker, segment in segments:
+        if is_exif_segment(marker, segment):
+            return segment[4:]
+    return b""
+
+def write_segments_with_exif(src, segments, dest_path, exif_bytes):
+    """
+    Writes a JPEG to dest_path from already-read header segments plus the rest
+    of the open source file src (positioned at SOS, as read_header_segments
+    leaves it), with the Exif APP1 segment replaced by exif_bytes.
+    dest_path is replaced only once the new file is complete, so src may be
+    dest_path itself or a hardlink to it.
+    """
+    if not exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = EXIF_HEADER + exif_bytes
+    if len(exif_bytes) > MAX_SEGMENT_DATA:
+        raise ValueError("EXIF data is too large for an APP1 segment")
+    new_segment = b"\xff\xe1" + struct.pack(">H", len(exif_bytes) + 2) + exif_bytes
+
+    out = []
+    inserted = False
+    for marker, segment in segments:
+        if is_exif_segment(marker, segment):
+            # Replace in place; drop any duplicate Exif segments
+            if not inserted:
+                out.append(new_segment)
+                inserted = True
+            continue
+        out.append(segment)
+
+    if not inserted:
+        # Exif goes right after SOI, or after the JFIF APP0 segment if present
+        pos = 1 if segments and segments[0][0] == APP0 else 0
+        out.insert(pos, new_segment)
+
+    with open_replacing(dest_path) as dst:
+        dst.write(SOI)
+        dst.writelines(out)
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+# TIFF tags used for the capture time
+TAG_DATETIME = 306
+TAG_EXIF_IFD = 34665
+TAG_DATETIME_ORIGINAL = 36867
+TAG_GPS_IFD = 34853
+TIFF_ASCII = 2
+# Large enough for SOI + APP0 + a typical Exif APP1 in one read
+HEADER_READ_SIZE = 64 * 1024
+# TIFF-based RAW files keep IFD0 and the Exif IFD near the start of the file
+RAW_HEADER_READ_SIZE = 256 * 1024
+# Upper bound for a HEIF 'meta' box; real ones are a few KB
+MAX_META_BOX_SIZE = 4 * 1024 * 1024
+
+def find_exif_segment(f):
+    """
+    Seeks through JPEG marker segments and returns the Exif TIFF data, or b"".
+    Non-Exif segments are skipped with seek() instead of being read.
+    """
+    if f.read(2) != SOI:
+        raise ValueError("Not a JPEG file")
+
+    while True:
+        head = f.read(4)
+        if len(head) < 4 or head[0] != 0xFF:
+            raise ValueError("Broken JPEG marker")
+        marker = head[1]
+        if marker in (SOS, EOI):
+            return b""
+        length = struct.unpack(">H", head[2:4])[0]
+        if marker == APP1:
+            data = f.read(length - 2)
+            if data.startswith(EXIF_HEADER):
+                return data[len(EXIF_HEADER):]
+        else:
+            f.seek(length - 2, 1)
+
+def read_ifd_tags(tiff, offset, endian, wanted):
+    """
+    Reads the entries of one IFD and returns {tag: value} for tags in wanted.
+    ASCII values are returned as bytes, everything else as the raw 32-bit value.
+    """
+    count = struct.unpack_from(endian + "H", tiff, offset)[0]
+    found = {}
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, typ, n = struct.unpack_from(endian + "HHI", tiff, entry)
+        if tag not in wanted:
+            continue
+        if typ == TIFF_ASCII:
+            start = entry + 8 if n <= 4 else struct.unpack_from(endian + "I", tiff, entry + 8)[0]
+            if start + n > len(tiff):
+                raise ValueError("Truncated TIFF value")
+            found[tag] = tiff[start:start + n].split(b"\x00", 1)[0]
+        else:
+            found[tag] = struct.unpack_from(endian + "I", tiff, entry + 8)[0]
+    return found
+
+def parse_tiff_header(tiff):
+    """
+    Returns (capture time string or None, has GPS IFD) from TIFF data.
+    The capture time is DateTimeOriginal (Exif IFD) or DateTime (IFD0).
+    """
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        raise ValueError("Invalid TIFF header")
+
+    ifd0 = struct.unpack_from(endian + "I", tiff, 4)[0]
+    tags = read_ifd_tags(tiff, ifd0, endian, (TAG_DATETIME, TAG_EXIF_IFD, TAG_GPS_IFD))
+
+    value = None
+    if TAG_EXIF_IFD in tags:
+        exif_tags = read_ifd_tags(tiff, tags[TAG_EXIF_IFD], endian, (TAG_DATETIME_ORIGINAL,))
+        value = exif_tags.get(TAG_DATETIME_ORIGINAL)
+    if value is None:
+        value = tags.get(TAG_DATETIME)
+    time_str = value.decode("utf-8") if value is not None else None
+    return time_str, TAG_GPS_IFD in tags
+
+def read_exif_header(image_path):
+    """
+    Reads (capture time string or None, has GPS) of a JPEG from its header only.
+    The file is opened with a buffer covering the usual header size, so
+    this is normally a single bounded read. Raises ValueError on bad data.
+    """
+    with open(image_path, "rb", buffering=HEADER_READ_SIZE) as f:
+        tiff = find_exif_segment(f)
+    if not tiff:
+        return None, False
+    try:
+        return parse_tiff_header(tiff)
+    except struct.error as e:
+        raise ValueError(f"Broken TIFF data: {e}")
+
+def read_raw_tiff(image_path):
+    """
+    Returns the leading TIFF data of a TIFF-based RAW file (CR2, NEF, ARW, DNG).
+    Offsets inside are relative to the file start, so the bounded head of the
+    file can be parsed like an Exif TIFF block.
+    """
+    with open(image_path, "rb") as f:
+        tiff = f.read(RAW_HEADER_READ_SIZE)
+    if tiff[:4] not in (b"II*\x00", b"MM\x00*"):
+        raise ValueError("Not a TIFF-based RAW file")
+    return tiff
+
+def _iter_boxes(data, start, end):
+    """
+    Yields (type, body_start, body_end) for the ISO BMFF boxes in data[start:end].
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, typ = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError("Broken HEIF box")
+        yield typ, pos + header, min(pos + size, end)
+        pos += size
+
+def _read_uint(data, pos, size):
+    if size == 0:
+        return 0, pos
+    if size == 4:
+        return struct.unpack_from(">I", data, pos)[0], pos + 4
+    if size == 8:
+        return struct.unpack_from(">Q", data, pos)[0], pos + 8
+    raise ValueError(f"Unsupported HEIF field size: {size}")
+
+def _find_meta_box(f):
+    """
+    Walks the top-level boxes of a HEIF file with seeks and returns the
+    'meta' box body. Only the box headers and the meta box are read.
+    """
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            raise ValueError("HEIF file has no meta box")
+        size, typ = struct.unpack(">I4s", head)
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            raise ValueError("HEIF file has no meta box")
+        if size < header:
+            raise ValueError("Broken HEIF box")
+        if typ == b"meta":
+            if size > MAX_META_BOX_SIZE:
+                raise ValueError("HEIF meta box is too large")
+            return f.read(size - header)
+        f.seek(size - header, 1)
+
+def _find_exif_item(meta):
+    """
+    Returns (construction_method, extents, idat) for the Exif item in a meta
+    box body, where extents is a list of (offset, length), or None.
+    """
+    exif_id = None
+    locations = {}
+    idat = None
+    # meta is a FullBox: skip version and flags
+    for typ, start, end in _iter_boxes(meta, 4, len(meta)):
+        if typ == b"iinf":
+            version = meta[start]
+            pos = start + 4 + (2 if version == 0 else 4)
+            for ityp, istart, iend in _iter_boxes(meta, pos, end):
+                if ityp != b"infe" or meta[istart] < 2:
+                    continue
+                if meta[istart] == 2:
+                    item_id = struct.unpack_from(">H", meta, istart + 4)[0]
+                    item_type = meta[istart + 8:istart + 12]
+                else:
+                    item_id = struct.unpack_from(">I", meta, istart + 4)[0]
+                    item_type = meta[istart + 10:istart + 14]
+                if item_type == b"Exif":
+                    exif_id = item_id
+        elif typ == b"iloc":
+            version = meta[start]
+            pos = start + 4
+            offset_size, length_size = meta[pos] >> 4, meta[pos] & 0x0F
+            base_offset_size = meta[pos + 1] >> 4
+            index_size = meta[pos + 1] & 0x0F if version in (1, 2) else 0
+            pos += 2
+            if version < 2:
+                count = struct.unpack_from(">H", meta, pos)[0]
+                pos += 2
+            else:
+                count = struct.unpack_from(">I", meta, pos)[0]
+                pos += 4
+            for _ in range(count):
+                if version < 2:
+                    item_id = struct.unpack_from(">H", meta, pos)[0]
+                    pos += 2
+                else:
+                    item_id = struct.unpack_from(">I", meta, pos)[0]
+                    pos += 4
+                method = 0
+                if version in (1, 2):
+                    method = struct.unpack_from(">H", meta, pos)[0] & 0x0F
+                    pos += 2
+                pos += 2  # data_reference_index
+                base_offset, pos = _read_uint(meta, pos, base_offset_size)
+                extent_count = struct.unpack_from(">H", meta, pos)[0]
+                pos += 2
+                extents = []
+                for _ in range(extent_count):
+                    _, pos = _read_uint(meta, pos, index_size)
+                    offset, pos = _read_uint(meta, pos, offset_size)
+                    length, pos = _read_uint(meta, pos, length_size)
+                    extents.append((base_offset + offset, length))
+                locations[item_id] = (method, extents)
+        elif typ == b"idat":
+            idat = meta[start:end]
+
+    if exif_id is None or exif_id not in locations:
+        return None
+    method, extents = locations[exif_id]
+    return method, extents, idat
+
+def read_heif_tiff(image_path):
+    """
+    Returns the Exif TIFF data of a HEIC/HEIF file, or b"".
+    Only the box headers, the meta box and the Exif item are read.
+    """
+    with open(image_path, "rb") as f:
+        meta = _find_meta_box(f)
+        try:
+            found = _find_exif_item(meta)
+        except struct.error as e:
+            raise ValueError(f"Broken HEIF meta box: {e}")
+        if found is None:
+            return b""
+        method, extents, idat = found
+        chunks = []
+        for offset, length in extents:
+            if method == 0:
+                f.seek(offset)
+                chunks.append(f.read(length))
+            elif method == 1 and idat is not None:
+                chunks.append(idat[offset:offset + length])
+            else:
+                raise ValueError("Unsupported HEIF item construction method")
+    payload = b"".join(chunks)
+    # Exif item: 4-byte offset to the TIFF header, then the TIFF data
+    if len(payload) < 4:
+        return b""
+    tiff_offset = struct.unpack_from(">I", payload, 0)[0]
+    return payload[4 + tiff_offset:]
@@ -0,0 +1,99 @@
+import os
+import sys
+from .exif_io import parse_tiff_header, read_heif_tiff, read_raw_tiff
+
+JPEG_EXTENSIONS = {".jpg", ".jpeg"}
+RAW_EXTENSIONS = {".cr2", ".nef", ".arw", ".dng"}
+HEIF_EXTENSIONS = {".heic", ".heif"}
+# Formats that get GPS through an XMP sidecar instead of a rewritten copy
+SIDECAR_EXTENSIONS = RAW_EXTENSIONS | HEIF_EXTENSIONS
+IMAGE_EXTENSIONS = JPEG_EXTENSIONS | SIDECAR_EXTENSIONS
+
+XMP_TEMPLATE = """<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:exif="http://ns.adobe.com/exif/1.0/"
+   exif:GPSVersionID="2.3.0.0"
+   exif:GPSLatitude="{lat}"
+   exif:GPSLongitude="{lon}"/>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>
+"""
+
+def extension(path):
+    return os.path.splitext(path)[1].lower()
+
+def is_sidecar_format(path):
+    """
+    True for RAW/HEIF files, which are tagged through an XMP sidecar.
+    """
+    return extension(path) in SIDECAR_EXTENSIONS
+
+def read_sidecar_format_header(image_path):
+    """
+    Returns (capture time string or None, has GPS) for a RAW/HEIF file,
+    read from the file header without decoding the image.
+    Raises ValueError for files that can't be parsed.
+    """
+    ext = extension(image_path)
+    if ext in RAW_EXTENSIONS:
+        tiff = read_raw_tiff(image_path)
+    elif ext in HEIF_EXTENSIONS:
+        tiff = read_heif_tiff(image_path)
+    else:
+        raise ValueError(f"Unsupported format: {ext}")
+    if not tiff:
+        return None, False
+    try:
+        return parse_tiff_header(tiff)
+    except Exception as e:
+        raise ValueError(f"Broken TIFF data: {e}")
+
+def to_xmp_coordinate(value, refs):
+    """
+    Formats decimal degrees as an XMP GPS coordinate, "DDD,MM.mmmmmmK".
+    """
+    ref = refs[1] if value < 0 else refs[0]
+    abs_value = abs(value)
+    deg = int(abs_value)
+    minutes = (abs_value - deg) * 60
+    return f"{deg},{minutes:.6f}{ref}"
+
+def sidecar_path(image_path, dest_folder):
+    """
+    Sidecar name for image_path in dest_folder: IMG_0001.CR2 -> IMG_0001.xmp
+    """
+    base = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(dest_folder, base + ".xmp")
+
+def write_xmp_sidecar(image_path, lat, lon, dest_folder, overwrite=False, has_gps=None):
+    """
+    Writes GPS into an .xmp sidecar in dest_folder instead of copying the
+    (large) RAW/HEIF file. Photos that already carry GPS are left alone
+    unless overwrite is True; has_gps, when the caller has already read the
+    header, saves reading it again.
+    Returns (written, path): the sidecar path, or None when nothing was
+    written (photo left untouched, or on error).
+    """
+    try:
+        if not overwrite:
+            if has_gps is None:
+                try:
+                    _, has_gps = read_sidecar_format_header(image_path)
+                except ValueError:
+                    has_gps = False
+            if has_gps:
+                # Left untouched; nothing is written for this photo
+                return False, None
+
+        os.makedirs(dest_folder, exist_ok=True)
+        dest_path = sidecar_path(image_path, dest_folder)
+        xmp = XMP_TEMPLATE.format(lat=to_xmp_coordinate(lat, "NS"), lon=to_xmp_coordinate(lon, "EW"))
+        with open(dest_path, "w", encoding="utf-8") as f:
+            f.write(xmp)
+        return True, dest_path
+    except Exception as e:
+        print(f"Error processing {image_path}: {e}", file=sys.stderr)
+        return False, None
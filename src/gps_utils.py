@@ -1,12 +1,27 @@
-import json
 import datetime
 import bisect
+import heapq
+import math
+from array import array
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# Matching modes
+MATCH_NEAREST = "nearest"
+MATCH_LINEAR = "linear"
+MATCH_GREAT_CIRCLE = "great_circle"
+MATCH_MODES = (MATCH_NEAREST, MATCH_LINEAR, MATCH_GREAT_CIRCLE)
+
+# UTC offset of a point whose local time zone is not recorded (UTC-only formats)
+UNKNOWN_OFFSET = math.nan
 
 def parse_geo_point(point_str):
     """
-    Parses string "35.6978689°, 139.7731628°" into (lat, lon) floats.
+    Parses string "35.6978689°, 139.7731628°" (or "geo:35.69,139.77") into (lat, lon) floats.
     """
     try:
+        if point_str.startswith('geo:'):
+            point_str = point_str[4:]
         parts = point_str.split(',')
         lat = float(parts[0].strip().replace('°', ''))
         lon = float(parts[1].strip().replace('°', ''))
@@ -16,73 +31,300 @@ def parse_geo_point(point_str):
 
 def parse_timestamp(time_str):
     """
-    Parses ISO 8601 string to datetime object.
+    Parses ISO 8601 string to datetime object ("Z" is accepted as UTC).
     """
     try:
+        if time_str.endswith('Z'):
+            time_str = time_str[:-1] + '+00:00'
         return datetime.datetime.fromisoformat(time_str)
-    except ValueError:
+    except (ValueError, AttributeError):
         return None
 
-def load_timeline_points(json_path):
+def to_epoch(dt):
     """
-    Loads the timeline JSON and returns a sorted list of (timestamp, lat, lon).
-    Extracts points from 'timelinePath' inside 'semanticSegments'.
+    Converts a datetime to seconds since 1970-01-01 on its own wall clock.
+    tzinfo is ignored; used for naive camera times, which are resolved to UTC
+    with TimelineIndex.resolve_local_times.
     """
-    points = []
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        segments = data.get('semanticSegments', [])
-        for segment in segments:
-            timeline = segment.get('timelinePath', [])
-            if not timeline:
-                # Fallback: check if 'visit' or 'activity' has start/end location and time
-                # Ideally we prefer high density points, but start/end is better than nothing if needed.
-                # For now, let's stick to timelinePath or strict design requirements.
-                # Design says: "Google Maps Timeline JSON".
-                pass
-
-            for point in timeline:
-                p_str = point.get('point')
-                t_str = point.get('time')
-                if p_str and t_str:
-                    lat, lon = parse_geo_point(p_str)
-                    dt = parse_timestamp(t_str)
-                    if lat is not None and lon is not None and dt is not None:
-                        points.append((dt, lat, lon))
-                        
-    except Exception as e:
-        print(f"Error loading timeline: {e}")
-        return []
-
-    # Sort by timestamp just in case
-    points.sort(key=lambda x: x[0])
-    return points
+    return (dt.replace(tzinfo=None) - _EPOCH).total_seconds()
 
-def find_nearest_point(target_time, points):
+def from_epoch(seconds):
     """
-    Finds the (lat, lon) from 'points' closest in time to target_time.
-    Points is a list of (datetime, lat, lon), sorted by datetime.
+    Converts wall-clock epoch seconds back to a naive datetime.
     """
-    if not points:
+    return _EPOCH + datetime.timedelta(seconds=seconds)
+
+def to_utc_epoch(dt):
+    """
+    Converts a datetime to UTC epoch seconds and its UTC offset in seconds.
+    Naive datetimes are taken as UTC (offset 0).
+    """
+    offset = dt.utcoffset()
+    if offset is None:
+        return to_epoch(dt), 0.0
+    return dt.timestamp(), offset.total_seconds()
+
+# Ascending runs at least this long are kept as they are; shorter ones are
+# gathered into blocks of SORT_BLOCK points and sorted one block at a time
+MIN_RUN = 1024
+SORT_BLOCK = 64 * 1024
+
+def _sorted_order(times):
+    """
+    Returns the permutation that sorts times (stable) as an array('l'),
+    or None if already sorted.
+    Exports are mostly made of ordered stretches, so the permutation is built
+    from sorted runs merged with heapq: only the run being sorted and the
+    heap (one entry per run) are Python objects, the rest stays in arrays.
+    """
+    n = len(times)
+    if all(times[i] <= times[i + 1] for i in range(n - 1)):
         return None
+    order = array('l')
+    runs = []
+    start = 0
+    while start < n:
+        end = start + 1
+        while end < n and times[end - 1] <= times[end]:
+            end += 1
+        if end - start < MIN_RUN:
+            end = min(n, start + SORT_BLOCK)
+            order.extend(sorted(range(start, end), key=times.__getitem__))
+        else:
+            order.extend(range(start, end))
+        runs.append((start, end))
+        start = end
+    if len(runs) == 1:
+        return order
+
+    def run_items(first, last):
+        for k in range(first, last):
+            i = order[k]
+            yield times[i], i
+
+    # Ties keep their input order: equal times compare by index
+    return array('l', (i for _, i in heapq.merge(*(run_items(first, last) for first, last in runs))))
+
+def sort_columns(times, *columns):
+    """
+    Sorts parallel arrays by times; returns them unchanged if already sorted.
+    """
+    order = _sorted_order(times)
+    if order is None:
+        return (times,) + columns
+    return tuple(array('d', (values[i] for i in order)) for values in (times,) + columns)
+
+class TimelineIndex:
+    """
+    Sorted timeline points stored as compact parallel arrays.
+    times: UTC epoch seconds (array('d')), lats/lons: degrees.
+    UTC offsets are kept as transitions: offsets[i] applies from offset_times[i]
+    (UTC) until the next transition, so a trip across time zones costs a few
+    entries instead of one per point.
+    source_points is the number of points the timeline was loaded with
+    (larger than len() after compaction, see compaction.py).
+    Build once per run and reuse it for every photo.
+    """
+    def __init__(self, times=None, lats=None, lons=None, offset_times=None, offsets=None):
+        self.times = times if times is not None else array('d')
+        self.lats = lats if lats is not None else array('d')
+        self.lons = lons if lons is not None else array('d')
+        self.offset_times = offset_times if offset_times is not None else array('d')
+        self.offsets = offsets if offsets is not None else array('d')
+        self.source_points = len(self.times)
+        self._local_starts = None
 
-    # Use bisect to find insertion point
-    timestamps = [p[0] for p in points]
-    idx = bisect.bisect_left(timestamps, target_time)
+    @classmethod
+    def build(cls, times, lats, lons, point_offsets=None):
+        """
+        Builds an index from unsorted parallel arrays; point_offsets holds each
+        point's UTC offset in seconds and is compressed into transitions.
+        Points with UNKNOWN_OFFSET keep the offset in effect before them.
+        """
+        if point_offsets is None:
+            times, lats, lons = sort_columns(times, lats, lons)
+        else:
+            times, lats, lons, point_offsets = sort_columns(times, lats, lons, point_offsets)
 
-    # Check idx and idx-1 to see which is closer
-    candidates = []
-    if idx < len(points):
-        candidates.append(points[idx])
-    if idx > 0:
-        candidates.append(points[idx - 1])
+        offset_times = array('d')
+        offsets = array('d')
+        if point_offsets is not None:
+            last = None
+            for t, offset in zip(times, point_offsets):
+                if offset != last and not math.isnan(offset):
+                    offset_times.append(t)
+                    offsets.append(offset)
+                    last = offset
+        return cls(times, lats, lons, offset_times, offsets)
 
-    if not candidates:
+    @classmethod
+    def from_points(cls, points):
+        """
+        Builds an index from an iterable of (datetime, lat, lon).
+        """
+        times, lats, lons, point_offsets = array('d'), array('d'), array('d'), array('d')
+        for dt, lat, lon in points:
+            t, offset = to_utc_epoch(dt)
+            times.append(t)
+            lats.append(lat)
+            lons.append(lon)
+            point_offsets.append(offset)
+        return cls.build(times, lats, lons, point_offsets)
+
+    def __len__(self):
+        return len(self.times)
+
+    def resolve_local_times(self, local_times, camera_offset=None):
+        """
+        Converts naive wall-clock epoch seconds (camera times) to UTC epoch seconds.
+        With camera_offset (seconds), the camera clock is taken to be set to that
+        fixed UTC offset. Otherwise each time is resolved against the offset that
+        was in effect in the timeline at that wall-clock time.
+        Returns an array('d') aligned to local_times.
+        """
+        if camera_offset is not None:
+            return array('d', (t - camera_offset for t in local_times))
+        offsets = self.offsets
+        if not offsets:
+            return array('d', local_times)
+
+        starts = self._local_starts
+        if starts is None:
+            # Wall-clock time at which each offset starts; kept non-decreasing
+            # so it can be bisected even when a transition moves the clock back.
+            starts = array('d')
+            last = -math.inf
+            for t, offset in zip(self.offset_times, offsets):
+                last = max(last, t + offset)
+                starts.append(last)
+            self._local_starts = starts
+
+        bisect_right = bisect.bisect_right
+        result = array('d')
+        for t in local_times:
+            i = bisect_right(starts, t) - 1
+            result.append(t - offsets[i if i > 0 else 0])
+        return result
+
+    def _to_utc(self, t):
+        """
+        Converts a lookup argument to UTC epoch seconds: aware datetimes are
+        absolute, naive ones are camera wall-clock times, floats are already UTC.
+        """
+        if isinstance(t, datetime.datetime):
+            if t.tzinfo is not None:
+                return t.timestamp()
+            return self.resolve_local_times((to_epoch(t),))[0]
+        return t
+
+    def nearest_index(self, t):
+        """
+        Returns the index of the point closest in time to t (UTC epoch seconds).
+        """
+        times = self.times
+        idx = bisect.bisect_left(times, t)
+        if idx >= len(times):
+            return len(times) - 1
+        if idx > 0 and t - times[idx - 1] < times[idx] - t:
+            return idx - 1
+        return idx
+
+    def lookup(self, target_time, mode=MATCH_NEAREST, max_gap=None):
+        """
+        Returns (lat, lon) for target_time, or None if empty or out of max_gap.
+        target_time may be a datetime (naive = camera wall-clock time) or UTC epoch seconds.
+        """
+        return self.lookup_many([target_time], mode, max_gap)[0]
+
+    def lookup_many(self, target_times, mode=MATCH_NEAREST, max_gap=None):
+        """
+        Looks up a whole batch of times at once.
+        target_times are UTC epoch seconds (see resolve_local_times) or datetimes.
+        mode: MATCH_NEAREST snaps to the closest point in time, MATCH_LINEAR and
+        MATCH_GREAT_CIRCLE interpolate between the two bracketing points.
+        max_gap (seconds): interpolation is used only when the bracketing points
+        are at most max_gap apart, otherwise the nearest point is used if it is
+        within max_gap; anything further away is "no match".
+        Returns a list of (lat, lon) or None, aligned to target_times.
+        """
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {mode}")
+        times, lats, lons = self.times, self.lats, self.lons
+        n = len(times)
+        if not n:
+            return [None] * len(target_times)
+        interpolate = None
+        if mode == MATCH_LINEAR:
+            interpolate = interpolate_linear
+        elif mode == MATCH_GREAT_CIRCLE:
+            interpolate = interpolate_great_circle
+        bisect_left = bisect.bisect_left
+        results = []
+        to_utc = self._to_utc
+        for t in target_times:
+            t = to_utc(t)
+            idx = bisect_left(times, t)
+            if interpolate is not None and 0 < idx < n:
+                t0, t1 = times[idx - 1], times[idx]
+                if max_gap is None or t1 - t0 <= max_gap:
+                    f = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+                    results.append(interpolate(lats[idx - 1], lons[idx - 1], lats[idx], lons[idx], f))
+                    continue
+            if idx >= n:
+                idx = n - 1
+            elif idx > 0 and t - times[idx - 1] < times[idx] - t:
+                idx -= 1
+            if max_gap is not None and abs(times[idx] - t) > max_gap:
+                results.append(None)
+            else:
+                results.append((lats[idx], lons[idx]))
+        return results
+
+def interpolate_linear(lat0, lon0, lat1, lon1, f):
+    """
+    Interpolates linearly in degrees, taking the short way across the antimeridian.
+    """
+    dlon = lon1 - lon0
+    if dlon > 180:
+        dlon -= 360
+    elif dlon < -180:
+        dlon += 360
+    lon = lon0 + dlon * f
+    if lon > 180:
+        lon -= 360
+    elif lon < -180:
+        lon += 360
+    return lat0 + (lat1 - lat0) * f, lon
+
+def interpolate_great_circle(lat0, lon0, lat1, lon1, f):
+    """
+    Interpolates along the great circle between two points (spherical slerp).
+    """
+    phi0, lam0 = math.radians(lat0), math.radians(lon0)
+    phi1, lam1 = math.radians(lat1), math.radians(lon1)
+    x0, y0, z0 = math.cos(phi0) * math.cos(lam0), math.cos(phi0) * math.sin(lam0), math.sin(phi0)
+    x1, y1, z1 = math.cos(phi1) * math.cos(lam1), math.cos(phi1) * math.sin(lam1), math.sin(phi1)
+    dot = max(-1.0, min(1.0, x0 * x1 + y0 * y1 + z0 * z1))
+    omega = math.acos(dot)
+    if omega < 1e-12:
+        return interpolate_linear(lat0, lon0, lat1, lon1, f)
+    sin_omega = math.sin(omega)
+    a = math.sin((1 - f) * omega) / sin_omega
+    b = math.sin(f * omega) / sin_omega
+    x, y, z = a * x0 + b * x1, a * y0 + b * y1, a * z0 + b * z1
+    return math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+
+def find_nearest_point(target_time, points):
+    """
+    Finds the (lat, lon) from 'points' closest in time to target_time.
+    Points is a TimelineIndex, or a list of (datetime, lat, lon).
+    Prefer calling TimelineIndex.lookup directly; a list is indexed on every call.
+    """
+    if not points:
         return None
 
-    best_point = min(candidates, key=lambda p: abs(p[0] - target_time))
-    
+    if not isinstance(points, TimelineIndex):
+        points = TimelineIndex.from_points(points)
+
     # Optional: Define a threshold? Design doesn't specify one, just "closest time".
-    return best_point[1], best_point[2]
+    return points.lookup(target_time)
@@ -1,23 +1,32 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
+import queue
+import sys
 import threading
 from .config import Config
-from .gps_utils import load_timeline_points, find_nearest_point
-from .image_utils import get_image_files, get_image_timestamp, add_gps_to_exif
+from .gps_utils import MATCH_MODES
+from .transfer import TRANSFER_MODES
+# The processing stack (processor, Pillow, piexif, ...) is imported when a run
+# starts, so the window appears without waiting for it.
+
+# How often the Tk main loop picks up events from the worker thread (ms)
+POLL_INTERVAL_MS = 100
 
 class App:
     def __init__(self, root):
         self.root = root
         self.root.title("Log2Exif")
         self.config = Config.load()
+        # Worker thread -> Tk main loop; widgets are only touched in poll_events
+        self.events = queue.Queue()
         
         self.create_widgets()
         self.load_settings_to_ui()
 
     def create_widgets(self):
         # JSON File Selection
-        tk.Label(self.root, text="Timeline JSON:").grid(row=0, column=0, sticky="e", padx=5, pady=5)
+        tk.Label(self.root, text="Timeline File:").grid(row=0, column=0, sticky="e", padx=5, pady=5)
         self.json_entry = tk.Entry(self.root, width=50)
         self.json_entry.grid(row=0, column=1, padx=5, pady=5)
         tk.Button(self.root, text="Select", command=self.select_json).grid(row=0, column=2, padx=5, pady=5)
@@ -38,16 +47,50 @@ class App:
         self.overwrite_var = tk.BooleanVar()
         tk.Checkbutton(self.root, text="Overwrite existing GPS data", variable=self.overwrite_var).grid(row=3, column=1, sticky="w", padx=5, pady=5)
 
+        # Incremental Checkbox
+        self.incremental_var = tk.BooleanVar()
+        tk.Checkbutton(self.root, text="Skip photos processed in previous runs", variable=self.incremental_var).grid(row=4, column=1, sticky="w", padx=5, pady=5)
+
+        # Match Mode
+        tk.Label(self.root, text="Match mode:").grid(row=5, column=0, sticky="e", padx=5, pady=5)
+        self.match_mode_var = tk.StringVar()
+        tk.OptionMenu(self.root, self.match_mode_var, *MATCH_MODES).grid(row=5, column=1, sticky="w", padx=5, pady=5)
+
+        # Max Time Gap (0 = unlimited)
+        tk.Label(self.root, text="Max gap in minutes (0 = unlimited):").grid(row=6, column=0, sticky="e", padx=5, pady=5)
+        self.max_gap_var = tk.DoubleVar()
+        tk.Spinbox(self.root, from_=0, to=1440, width=7, textvariable=self.max_gap_var).grid(row=6, column=1, sticky="w", padx=5, pady=5)
+
+        # Camera Clock Time Zone (blank = from timeline)
+        tk.Label(self.root, text="Camera UTC offset in hours (blank = auto):").grid(row=7, column=0, sticky="e", padx=5, pady=5)
+        self.camera_offset_entry = tk.Entry(self.root, width=7)
+        self.camera_offset_entry.grid(row=7, column=1, sticky="w", padx=5, pady=5)
+        self.apply_clock_var = tk.BooleanVar()
+        tk.Checkbutton(self.root, text="Correct camera clock error", variable=self.apply_clock_var).grid(row=7, column=2, sticky="w", padx=5, pady=5)
+
+        # Transfer Mode for unchanged photos
+        tk.Label(self.root, text="Unchanged photos:").grid(row=8, column=0, sticky="e", padx=5, pady=5)
+        self.transfer_mode_var = tk.StringVar()
+        tk.OptionMenu(self.root, self.transfer_mode_var, *TRANSFER_MODES).grid(row=8, column=1, sticky="w", padx=5, pady=5)
+
+        # Worker Count (0 = automatic)
+        tk.Label(self.root, text="Workers (0 = auto):").grid(row=9, column=0, sticky="e", padx=5, pady=5)
+        self.workers_var = tk.IntVar()
+        tk.Spinbox(self.root, from_=0, to=64, width=5, textvariable=self.workers_var).grid(row=9, column=1, sticky="w", padx=5, pady=5)
+
         # Start Button
         self.start_btn = tk.Button(self.root, text="Start Processing", command=self.start_processing, bg="#dddddd")
-        self.start_btn.grid(row=4, column=1, pady=20, ipadx=20)
+        self.start_btn.grid(row=10, column=1, pady=20, ipadx=20)
+        # Dry run: match only and save a CSV report
+        self.preview_btn = tk.Button(self.root, text="Preview Matches", command=self.start_preview)
+        self.preview_btn.grid(row=10, column=2, pady=20, padx=5)
 
         # Status Label
         self.status_label = tk.Label(self.root, text="Ready")
-        self.status_label.grid(row=5, column=0, columnspan=3, sticky="w", padx=5)
+        self.status_label.grid(row=11, column=0, columnspan=3, sticky="w", padx=5)
 
     def select_json(self):
-        path = filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
+        path = filedialog.askopenfilename(filetypes=[("Timeline Files", "*.json *.gpx"), ("All Files", "*.*")])
         if path:
             self.json_entry.delete(0, tk.END)
             self.json_entry.insert(0, path)
@@ -69,168 +112,131 @@ class App:
         self.src_entry.insert(0, self.config.source_folder)
         self.dest_entry.insert(0, self.config.dest_folder)
         self.overwrite_var.set(self.config.overwrite)
+        self.incremental_var.set(self.config.incremental)
+        self.match_mode_var.set(self.config.match_mode)
+        self.max_gap_var.set(self.config.max_gap_minutes)
+        if self.config.camera_utc_offset is not None:
+            self.camera_offset_entry.insert(0, f"{self.config.camera_utc_offset:g}")
+        self.transfer_mode_var.set(self.config.transfer_mode)
+        self.apply_clock_var.set(self.config.apply_clock_offset)
+        self.workers_var.set(self.config.workers)
 
     def save_settings_from_ui(self):
         self.config.json_path = self.json_entry.get()
         self.config.source_folder = self.src_entry.get()
         self.config.dest_folder = self.dest_entry.get()
         self.config.overwrite = self.overwrite_var.get()
+        self.config.incremental = self.incremental_var.get()
+        self.config.match_mode = self.match_mode_var.get()
+        self.config.transfer_mode = self.transfer_mode_var.get()
+        self.config.apply_clock_offset = self.apply_clock_var.get()
+        try:
+            self.config.max_gap_minutes = max(0, self.max_gap_var.get())
+        except tk.TclError:
+            self.config.max_gap_minutes = 0
+        try:
+            offset = self.camera_offset_entry.get().strip()
+            self.config.camera_utc_offset = float(offset) if offset else None
+        except ValueError:
+            self.config.camera_utc_offset = None
+        try:
+            self.config.workers = max(0, self.workers_var.get())
+        except tk.TclError:
+            self.config.workers = 0
         self.config.save()
 
-    def start_processing(self):
+    def start_preview(self):
+        report_path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile="log2exif_report.csv",
+                                                   filetypes=[("CSV Files", "*.csv")])
+        if report_path:
+            self.start_processing(dry_run=True, report_path=report_path)
+
+    def start_processing(self, dry_run=False, report_path=None):
         self.save_settings_from_ui()
         
-        json_path = self.config.json_path
-        src_folder = self.config.source_folder
-        dest_folder = self.config.dest_folder
-        overwrite = self.config.overwrite
-
-        if not all([json_path, src_folder, dest_folder]):
-            messagebox.showerror("Error", "Please select all paths.")
-            return
+        options = self.config.job_options()
+        options.update(dry_run=dry_run, report_path=report_path)
 
-        if not os.path.exists(json_path):
-            messagebox.showerror("Error", "JSON file does not exist.")
+        from .processor import ProcessingError, validate_paths
+        try:
+            validate_paths(options["json_path"], options["src_folder"], options["dest_folder"])
+        except ProcessingError as e:
+            messagebox.showerror("Error", str(e))
             return
 
         self.start_btn.config(state="disabled")
+        self.preview_btn.config(state="disabled")
         self.status_label.config(text="Loading GPS data...")
         self.root.update()
 
         # Run in thread to avoid freezing UI strictly, but for simplicity we'll just run here with updates
         # Actually, let's use a simple thread to allow UI updates
-        threading.Thread(target=self.run_logic, args=(json_path, src_folder, dest_folder, overwrite)).start()
+        threading.Thread(target=self.run_logic, args=(options,)).start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
 
-    def run_logic(self, json_path, src_folder, dest_folder, overwrite):
+    def run_logic(self, options):
+        # Runs on the worker thread: report everything through self.events.
+        # options are run_job keyword arguments (see Config.job_options)
+        from .processor import ProcessingError, run_job
         try:
-            points = load_timeline_points(json_path)
-            if not points:
-                messagebox.showerror("Error", "No valid timeline points found in JSON.")
-                self.reset_ui()
-                return
-
-            self.update_status(f"Loaded {len(points)} points. Finding images...")
-            
-            images = get_image_files(src_folder)
-            total = len(images)
-            processed_count = 0
-
-            for i, img_path in enumerate(images):
-                self.update_status(f"Processing {i+1}/{total}: {os.path.basename(img_path)}")
-                
-                # Get timestamp
-                dt = get_image_timestamp(img_path)
-                
-                # Find nearest GPS
-                # Note: Timezone awareness issues might arise if image is naive and GPS is aware.
-                # GPS utils returns aware datetime. 
-                # piexif string is naive.
-                # we need to handle this.
-                
-                # Handling Timezone for matching:
-                # If dt is naive, assume local or assume same timezone as JSON? 
-                # JSON has offset.
-                # Let's make dt aware if it's naive, assuming local or provided logic.
-                # For simplicity, we can strip timezone from GPS points or add timezone to image.
-                # `gps_utils.find_nearest_point` expects simple comparison.
-                
-                # Let's trust python datetime comparison handles it or errors if mixed.
-                # Fix: Make sure both are same type. 
-                # `datetime.datetime.fromisoformat` returns aware if string has offset. `timeline_sample` has offset.
-                # `get_image_timestamp` returns naive from string or `fromtimestamp`.
-                
-                if dt.tzinfo is None:
-                    # Naive to Aware (Local) is complex without pytz.
-                    # Hack: Make the GPS points naive (UTC conversion then strip) or just strip.
-                    # Since photos are usually in "Wall clock time" of where they were taken,
-                    # and Timeline is absolute time.
-                    # This is the trickiest part of Geotagging.
-                    # Assumption: Image time is local time where photo was taken.
-                    # Timeline time is absolute.
-                    # We need the timezone of the location where photo was taken to convert Image Time -> Absolute.
-                    # But we don't know the location yet!
-                    # Chicken and egg.
-                    
-                    # Simplification: Assume the camera time is in the same timezone as the JSON data implies for that time? 
-                    # OR, simply ignore timezone and match on "Local Time" values? 
-                    # Timeline gives absolute time. 
-                    
-                    # Let's try matching timestamps by converting Timeline points to Naive (UTC or Local?).
-                    # But Timeline moves across timezones.
-                    
-                    # Standard approach: User usually keeps camera on home time or updates it.
-                    # If we simply compare "2025-09-13 17:05" (Image) with "2025-09-13 17:05+09:00" (Timeline).
-                    # If we drop timezone from Timeline, we get "17:05". It matches.
-                    # Ideally we match on naive time.
-                    pass
-                
-                # Quick Fix for logic:
-                # Convert logic inside `run_logic` to handle timezone stripping for comparison
-                # We will perform the fix in `gps_utils` or here.
-                # Let's just strip TZ from GPS points for comparison purposes, assuming camera time matches wall clock time of the GPS point.
-                
-                # But wait, `gps_utils` is already imported.
-                # I will modify how I call it or modify the points list here.
-                
-                # NOTE: I need to handle this discrepancy.
-                # For now, I will modify `run_logic` to strip timezone from the loaded points before passing to `find_nearest_point`.
-                # Actually `find_nearest_point` takes a list. I should re-process the list here.
-                
-            self.points_stripped = []
-            for p in points:
-                # p is (dt, lat, lon)
-                # Convert dt to naive
-                dt_naive = p[0].replace(tzinfo=None)
-                self.points_stripped.append((dt_naive, p[1], p[2]))
-
-            # Now loop images
-            for i, img_path in enumerate(images):
-                 self.update_status(f"Processing {i+1}/{total}: {os.path.basename(img_path)}")
-                 
-                 # Calculate destination path maintaining structure
-                 rel_path = os.path.relpath(img_path, src_folder)
-                 target_dir = os.path.join(dest_folder, os.path.dirname(rel_path))
-                 
-                 dt = get_image_timestamp(img_path)
-                 
-                 # dt is likely naive.
-                 # If dt has tz (unlikely from piexif unless sophisticated), strip it too.
-                 if dt.tzinfo is not None:
-                     dt = dt.replace(tzinfo=None)
-
-                 lat, lon = find_nearest_point(dt, self.points_stripped)
-                 
-                 if lat is not None and lon is not None:
-                     add_gps_to_exif(img_path, lat, lon, target_dir, overwrite)
-                 else:
-                     # Just copy if no point found? Or log it?
-                     # Design says: "2回目以降は2からでOK". 
-                     # "4. 全画像に対して2,3を繰り返す"
-                     # If no point found, we should probably still move/copy it?
-                     # Let's just copy it to be safe so destination has everything.
-                     import shutil
-                     try:
-                         os.makedirs(target_dir, exist_ok=True)
-                         shutil.copy2(img_path, os.path.join(target_dir, os.path.basename(img_path)))
-                     except:
-                         pass
-                 
-                 processed_count += 1
-            
-            self.status_label.config(text=f"Done! Processed {processed_count} images.")
-            messagebox.showinfo("Success", "Processing complete.")
-            
+            summary = run_job(on_status=self.update_status, on_progress=self.on_progress, **options)
+            self.events.put(("done", summary))
+        except ProcessingError as e:
+            self.events.put(("error", str(e)))
         except Exception as e:
-            messagebox.showerror("Error", str(e))
-            print(e)
-        finally:
-            self.reset_ui()
+            print(e, file=sys.stderr)
+            self.events.put(("error", str(e)))
+
+    def on_progress(self, done, total, img_path):
+        # total is None while the source folder is still being scanned
+        self.update_status(f"Processing {done}/{total if total is not None else '?'}: {os.path.basename(img_path)}")
 
     def update_status(self, text):
-        self.status_label.config(text=text)
-        # self.root.update() # Can't call this from thread safely in all Tk versions, but usually fine.
-        # Better to use after? For simple script, this often works.
+        self.events.put(("status", text))
+
+    def poll_events(self):
+        """
+        Applies queued worker events to the widgets on the Tk main loop.
+        """
+        finished = False
+        latest_status = None
+        while True:
+            try:
+                kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "status":
+                # Only the newest status matters
+                latest_status = payload
+            elif kind == "done":
+                finished = True
+                if payload["dry_run"]:
+                    from .report import format_histogram
+                    # Kept photos have a match too, they only keep their existing GPS
+                    matched = payload["tagged"] + payload["kept"]
+                    self.status_label.config(text=f"Preview done: {matched} of {payload['processed']} images matched.")
+                    messagebox.showinfo(
+                        "Preview",
+                        f"Would tag {payload['tagged']}, keep {payload['kept']}, "
+                        f"leave {payload['unmatched']} unmatched.\n\n"
+                        f"Time to nearest timeline point:\n{format_histogram(payload['delta_histogram'])}\n\n"
+                        f"Report saved to {payload['report']}",
+                    )
+                else:
+                    self.status_label.config(text=f"Done! Processed {payload['processed']} images.")
+                    messagebox.showinfo("Success", "Processing complete.")
+            elif kind == "error":
+                finished = True
+                self.status_label.config(text="Error")
+                messagebox.showerror("Error", payload)
+
+        if finished:
+            self.reset_ui()
+            return
+        if latest_status is not None:
+            self.status_label.config(text=latest_status)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
     
     def reset_ui(self):
         self.start_btn.config(state="normal")
-
+        self.preview_btn.config(state="normal")
@@ -1,8 +1,14 @@
 import os
-import shutil
 import datetime
+import io
+import queue
+import sys
+import threading
 from PIL import Image
 import piexif
+from .transfer import check_not_same_file, copy_file
+from .formats import IMAGE_EXTENSIONS, is_sidecar_format, read_sidecar_format_header
+from .exif_io import exif_from_segments, read_exif_header, read_header_segments, write_segments_with_exif
 
 def get_image_timestamp(image_path):
     """
@@ -10,6 +16,42 @@ def get_image_timestamp(image_path):
     Returns datetime object.
     Priority: EXIF DateTimeOriginal > EXIF DateTime > File Modified Time
     """
+    return get_image_header(image_path)[0]
+
+def _parse_exif_time(time_str):
+    # EXIF format is "YYYY:MM:DD HH:MM:SS"
+    try:
+        if time_str:
+            return datetime.datetime.strptime(time_str, "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        pass
+    return None
+
+def get_image_header(image_path):
+    """
+    Returns (capture datetime, has GPS) read from the image header only,
+    falling back to the file modified time like get_image_timestamp.
+    """
+    if is_sidecar_format(image_path):
+        # RAW/HEIF: header only, Pillow can't open these anyway
+        try:
+            time_str, has_gps = read_sidecar_format_header(image_path)
+            dt = _parse_exif_time(time_str)
+            if dt is not None:
+                return dt, has_gps
+        except (OSError, ValueError):
+            has_gps = False
+        return _get_file_timestamp(image_path), has_gps
+
+    # Fast path: parse only the JPEG header
+    try:
+        time_str, has_gps = read_exif_header(image_path)
+        dt = _parse_exif_time(time_str)
+        return (dt if dt is not None else _get_file_timestamp(image_path)), has_gps
+    except (OSError, ValueError):
+        # Fall back to Pillow for anything the header parser can't handle
+        pass
+
     try:
         img = Image.open(image_path)
         exif_dict = piexif.load(img.info.get("exif", b""))
@@ -21,14 +63,17 @@ def get_image_timestamp(image_path):
         elif 306 in exif_dict.get("0th", {}):
             time_str = exif_dict["0th"][306].decode('utf-8')
 
-        if time_str:
-            # EXIF format is "YYYY:MM:DD HH:MM:SS"
-            return datetime.datetime.strptime(time_str, "%Y:%m:%d %H:%M:%S")
+        dt = _parse_exif_time(time_str)
+        if dt is not None:
+            return dt, bool(exif_dict.get("GPS"))
     except Exception as e:
         # print(f"Warning: Could not read EXIF for {image_path}: {e}")
         pass
 
     # Fallback to file system time
+    return _get_file_timestamp(image_path), False
+
+def _get_file_timestamp(image_path):
     timestamp = os.path.getmtime(image_path)
     return datetime.datetime.fromtimestamp(timestamp)
 
@@ -57,7 +102,7 @@ def to_deg(value, loc):
         loc_value
     )
 
-def add_gps_to_exif(image_path, lat, lon, dest_folder, overwrite=False):
+def add_gps_to_exif(image_path, lat, lon, dest_folder, overwrite=False, transfer=None, data=None):
     """
     Adds GPS data to the image and saves it to dest_folder.
     If GPS already exists:
@@ -65,65 +110,167 @@ def add_gps_to_exif(image_path, lat, lon, dest_folder, overwrite=False):
       - if overwrite is False: skip (copy original?). 
         Design says: "Positions that are already set -> Checkbox to overwrite".
         Implies if not checked, don't overwrite.
+    Unchanged files are passed to transfer (a FileTransfer; plain copy by default).
+    data, if given, is the whole file already read into memory; it is used
+    instead of reading image_path.
     """
     try:
         os.makedirs(dest_folder, exist_ok=True)
         filename = os.path.basename(image_path)
         dest_path = os.path.join(dest_folder, filename)
+        check_not_same_file(image_path, dest_path)
 
-        img = Image.open(image_path)
-        try:
-            exif_dict = piexif.load(img.info.get("exif", b""))
-        except:
-            exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+        # Read only the header segments; the image itself is never decoded.
+        # The source stays open so the write below streams from the same handle.
+        with (io.BytesIO(data) if data is not None else open(image_path, "rb")) as src:
+            segments = read_header_segments(src)
+            try:
+                exif_dict = piexif.load(exif_from_segments(segments))
+            except:
+                exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
 
-        # Check if GPS exists
-        has_gps = bool(exif_dict.get("GPS"))
-        
-        if has_gps and not overwrite:
-            # Just move/copy without changes
-            # Design says "Move processed files".
-            # If we don't process, do we move?
-            # Design: "3. 処理の終わった画像ファイルを処理後フォルダに移動する" (Move processed image files)
-            # If configured NOT to overwrite, and it has GPS, strictly speaking it's not "processed" with new data.
-            # However, typically users want *all* files in the destination.
-            # Let's assume we maintain the file as is but move it.
-            # But 'move' is destructive to source.
-            pass
-        else:
-            # Create GPS data
-            lat_deg = to_deg(lat, ["N", "S"])
-            lon_deg = to_deg(lon, ["E", "W"])
-
-            # GPS tag IDs: 1: LatRef, 2: Lat, 3: LonRef, 4: Lon
-            exif_dict["GPS"][1] = lat_deg[1].encode('utf-8')
-            exif_dict["GPS"][2] = lat_deg[0]
-            exif_dict["GPS"][3] = lon_deg[1].encode('utf-8')
-            exif_dict["GPS"][4] = lon_deg[0]
-            
-            # Write EXIF
-            exif_bytes = piexif.dump(exif_dict)
+            # Check if GPS exists
+            has_gps = bool(exif_dict.get("GPS"))
             
-            # Save to new location
-            img.save(dest_path, "jpeg", exif=exif_bytes)
-            return True, dest_path  # Processed and saved
+            if has_gps and not overwrite:
+                # Just move/copy without changes
+                # Design says "Move processed files".
+                # If we don't process, do we move?
+                # Design: "3. 処理の終わった画像ファイルを処理後フォルダに移動する" (Move processed image files)
+                # If configured NOT to overwrite, and it has GPS, strictly speaking it's not "processed" with new data.
+                # However, typically users want *all* files in the destination.
+                # Let's assume we maintain the file as is but move it.
+                # But 'move' is destructive to source.
+                # Transfer reusing the handle that is already open.
+                # (an in-memory copy has no file descriptor to copy from)
+                (transfer or copy_file)(image_path, dest_path, src if data is None else None)
+                return False, dest_path
+            else:
+                # Create GPS data
+                lat_deg = to_deg(lat, ["N", "S"])
+                lon_deg = to_deg(lon, ["E", "W"])
 
-        # If we didn't save above (because has_gps and not overwrite), we copy the original.
-        shutil.copy2(image_path, dest_path)
-        return False, dest_path
+                # GPS tag IDs: 1: LatRef, 2: Lat, 3: LonRef, 4: Lon
+                exif_dict["GPS"][1] = lat_deg[1].encode('utf-8')
+                exif_dict["GPS"][2] = lat_deg[0]
+                exif_dict["GPS"][3] = lon_deg[1].encode('utf-8')
+                exif_dict["GPS"][4] = lon_deg[0]
+                
+                # Write EXIF
+                exif_bytes = piexif.dump(exif_dict)
+                
+                # Save to new location, replacing only the APP1 segment
+                write_segments_with_exif(src, segments, dest_path, exif_bytes)
+                return True, dest_path  # Processed and saved
 
     except Exception as e:
-        print(f"Error processing {image_path}: {e}")
+        print(f"Error processing {image_path}: {e}", file=sys.stderr)
         return False, None
 
+# Directories whose images may wait in memory for the consumer of a parallel scan
+SCAN_QUEUE_SIZE = 64
+# Images handed over per queue item by a parallel scan, so a huge flat
+# directory is never held in memory as a whole
+SCAN_BATCH_SIZE = 256
+
+def _iter_dir(path, subdirs):
+    """
+    Yields the image DirEntries of one directory while it is being listed and
+    appends its subdirectory paths to subdirs.
+    Symlinked directories are not followed, like os.walk.
+    """
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        yield entry
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Error scanning {path}: {e}", file=sys.stderr)
+
+def _iter_parallel(folder, workers):
+    # Each thread lists one directory at a time and queues its subdirectories;
+    # pending counts directories queued or being listed, the scan ends at zero.
+    dir_q = queue.Queue()
+    out_q = queue.Queue(SCAN_QUEUE_SIZE)
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [1]
+
+    def put(item):
+        # Gives up once the consumer has stopped reading
+        while not stop.is_set():
+            try:
+                out_q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def walk():
+        while True:
+            path = dir_q.get()
+            if path is None:
+                return
+            if not stop.is_set():
+                subdirs = []
+                batch = []
+                for entry in _iter_dir(path, subdirs):
+                    batch.append(entry)
+                    if len(batch) >= SCAN_BATCH_SIZE:
+                        put(batch)
+                        batch = []
+                if batch:
+                    put(batch)
+                with lock:
+                    pending[0] += len(subdirs)
+                for subdir in subdirs:
+                    dir_q.put(subdir)
+            with lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                put(None)
+                for _ in range(workers):
+                    dir_q.put(None)
+
+    dir_q.put(folder)
+    for i in range(workers):
+        threading.Thread(target=walk, name=f"scan-{i}", daemon=True).start()
+    try:
+        while True:
+            images = out_q.get()
+            if images is None:
+                return
+            yield from images
+    finally:
+        stop.set()
+
+def iter_image_entries(folder, workers=1):
+    """
+    Yields an os.DirEntry for every supported image (JPEG, RAW, HEIF) under folder
+    as soon as its directory has been listed; extensions match case-insensitively.
+    entry.stat() reuses the data from the directory listing where the OS provides it.
+    With workers > 1, subdirectories are listed in parallel (in no fixed order),
+    which hides latency on network drives.
+    """
+    if workers > 1:
+        yield from _iter_parallel(folder, workers)
+        return
+
+    stack = [folder]
+    while stack:
+        subdirs = []
+        yield from _iter_dir(stack.pop(), subdirs)
+        # Reversed so subdirectories are visited in listing order, top-down like os.walk
+        stack.extend(reversed(subdirs))
+
 def get_image_files(folder):
     """
-    Recursively finds all JPEG images in a folder.
+    Recursively finds all supported images (JPEG, RAW, HEIF) in a folder.
     """
-    extensions = {".jpg", ".jpeg", ".JPG", ".JPEG"}
-    image_files = []
-    for root, dirs, files in os.walk(folder):
-        for file in files:
-            if os.path.splitext(file)[1] in extensions:
-                image_files.append(os.path.join(root, file))
-    return image_files
+    return [entry.path for entry in iter_image_entries(folder)]
@@ -0,0 +1,130 @@
+import json
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = " \t\n\r"
+# Characters that can follow a complete scalar value
+VALUE_END = WHITESPACE + ",]}:"
+
+class JsonStream:
+    """
+    Minimal incremental JSON reader over a text file object.
+    Containers can be walked one element at a time (iter_object / iter_array),
+    and small values are decoded with json's C decoder, so memory stays bounded
+    by the largest single element instead of the whole document.
+    """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """
+        Reads the next chunk, dropping the already consumed part of the buffer.
+        Returns False at end of file.
+        """
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character ("" at end of file).
+        """
+        while True:
+            buf = self.buf
+            pos = self.pos
+            n = len(buf)
+            while pos < n and buf[pos] in WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < n:
+                return buf[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise ValueError(f"Expected '{ch}' at offset {self.pos}")
+        self.pos += 1
+
+    def decode_value(self):
+        """
+        Decodes one complete JSON value at the current position.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value may be cut off at the end of the buffer
+                if self._fill():
+                    continue
+                raise
+            # A number cut off at the buffer end decodes as a shorter one ("0." -> 0):
+            # it must be followed by a delimiter, otherwise it continues in the next chunk
+            if not isinstance(value, (str, dict, list)):
+                if (end == len(self.buf) or self.buf[end] not in VALUE_END) and self._fill():
+                    continue
+            self.pos = end
+            return value
+
+    def iter_object(self):
+        """
+        Yields the keys of the object at the current position.
+        The caller must consume each value (decode_value, skip_value, ...)
+        before asking for the next key.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == "}":
+                return
+            if ch != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self.pos}")
+
+    def iter_array(self):
+        """
+        Yields the decoded elements of the array at the current position.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {self.pos}")
+
+    def skip_value(self):
+        """
+        Skips the value at the current position without building large containers.
+        """
+        ch = self.peek()
+        if ch == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif ch == "[":
+            for _ in self.iter_array():
+                pass
+        else:
+            self.decode_value()
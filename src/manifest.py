@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+MANIFEST_FILE = ".log2exif_manifest.sqlite"
+# Outcomes that are final; unmatched photos are retried, since a newer
+# timeline export may cover them.
+DONE_OUTCOMES = ("tagged", "kept")
+# Column added after the first release; older manifests are migrated on open
+OPTIONS_COLUMN = "options"
+# Rows are committed in batches to keep SQLite overhead per photo small
+COMMIT_EVERY = 500
+
+def options_key(options):
+    """
+    Short stable key for the run options (a dict of JSON values) that decide
+    what a photo's output looks like.
+    """
+    text = json.dumps(options or {}, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+class Manifest:
+    """
+    Record of photos processed into a destination folder, stored as SQLite.
+    A photo whose path, size and mtime match a finished record is skipped
+    on later runs without being opened, as long as the record was made with
+    the same options (see options_key): a run that would write something else,
+    e.g. with overwrite or a different max_gap, processes the photo again.
+    Finished records are loaded into memory for fast checks; with preload
+    False each check queries SQLite instead, so memory does not grow with
+    the size of the archive.
+    A read_only manifest only answers is_unchanged (e.g. for a dry run): it
+    creates nothing, and without an existing manifest nothing is unchanged.
+    """
+    def __init__(self, dest_folder, preload=True, read_only=False, options=None):
+        self.path = os.path.join(dest_folder, MANIFEST_FILE)
+        self.options = options_key(options)
+        self.read_only = read_only
+        self.lock = threading.Lock()
+        self.pending = []
+        self.done = None
+        if read_only:
+            if not os.path.isfile(self.path):
+                self.conn = None
+                self.done = {}
+                return
+            uri = Path(os.path.abspath(self.path)).as_uri() + "?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            os.makedirs(dest_folder, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS processed ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,"
+                " lat REAL, lon REAL, outcome TEXT, output TEXT, processed_at REAL, options TEXT)"
+            )
+            self.conn.commit()
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(processed)")]
+        if OPTIONS_COLUMN not in columns:
+            if read_only:
+                # Made before options were recorded: nothing counts as unchanged
+                self.done = {}
+                return
+            self.conn.execute(f"ALTER TABLE processed ADD COLUMN {OPTIONS_COLUMN} TEXT")
+            self.conn.commit()
+        # Only (size, mtime_ns) of records made with the same options is needed to decide skips
+        placeholders = ",".join("?" * len(DONE_OUTCOMES))
+        done_rows = f"FROM processed WHERE outcome IN ({placeholders}) AND {OPTIONS_COLUMN} = ?"
+        self.done_params = DONE_OUTCOMES + (self.options,)
+        self.done_query = f"SELECT size, mtime_ns {done_rows} AND path = ?"
+        if preload:
+            self.done = {
+                path: (size, mtime_ns)
+                for path, size, mtime_ns in self.conn.execute(f"SELECT path, size, mtime_ns {done_rows}",
+                                                              self.done_params)
+            }
+
+    @staticmethod
+    def key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def is_unchanged(self, path, size, mtime_ns):
+        """
+        True if path was finished by an earlier run and has not changed since.
+        """
+        if self.done is not None:
+            return self.done.get(self.key(path)) == (size, mtime_ns)
+        with self.lock:
+            row = self.conn.execute(self.done_query, self.done_params + (self.key(path),)).fetchone()
+        return row == (size, mtime_ns)
+
+    def record(self, path, size, mtime_ns, match, outcome, output):
+        """
+        Records the result for one photo. Safe to call from worker threads.
+        """
+        if self.read_only:
+            raise ValueError("Manifest is read-only")
+        lat, lon = match if match is not None else (None, None)
+        row = (self.key(path), size, mtime_ns, lat, lon, outcome, output, time.time(), self.options)
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= COMMIT_EVERY:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pending
+            )
+            self.conn.commit()
+            self.pending = []
+
+    def close(self):
+        if self.conn is None:
+            return
+        with self.lock:
+            self._flush()
+        self.conn.close()
@@ -0,0 +1,471 @@
+import os
+import pickle
+import queue
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from .gps_utils import MATCH_NEAREST, to_epoch
+from .formats import is_sidecar_format, write_xmp_sidecar
+from .image_utils import iter_image_entries, get_image_header, add_gps_to_exif
+from .progress import Metrics
+from .transfer import TRANSFER_AUTO, FileTransfer
+
+# Queue sizes bound how far a fast stage can run ahead of a slow one
+QUEUE_SIZE = 256
+# Number of photos matched per lookup_many call
+MATCH_BATCH_SIZE = 512
+
+_DONE = object()
+
+# Threads per I/O stage (timestamp reads, writes) when workers is 0/None.
+# They mostly wait on the disk or network, not the CPU, so the count does not
+# follow the number of cores: on a high-latency drive, fewer requests in
+# flight would leave the link idle between round trips.
+IO_WORKERS = 32
+
+def default_workers():
+    return IO_WORKERS
+
+class MemoryBudget:
+    """
+    Bytes of photo data the read-ahead may hold in memory at once.
+    acquire waits until the data fits, so reading ahead stops while earlier
+    photos are still waiting to be written. peak is the most ever held.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.cond = threading.Condition()
+
+    def fits(self, size):
+        return size <= self.limit
+
+    def acquire(self, size):
+        with self.cond:
+            self.cond.wait_for(lambda: self.used + size <= self.limit)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def release(self, size):
+        with self.cond:
+            self.used -= size
+            self.cond.notify_all()
+
+class _Stage:
+    """
+    Runs func over items from in_q on `workers` threads and puts the results on out_q.
+    When func raises, on_error(item, error) gives the result instead, so one bad
+    item never stops the stage (a dead stage would block the stages before it
+    on a full queue). Puts _DONE on out_q once every worker has seen _DONE on in_q.
+    """
+    def __init__(self, name, func, in_q, out_q, workers, on_error):
+        self.func = func
+        self.on_error = on_error
+        self.in_q = in_q
+        self.out_q = out_q
+        self.remaining = workers
+        self.lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+
+    def _work(self):
+        try:
+            while True:
+                item = self.in_q.get()
+                if item is _DONE:
+                    # Let sibling workers see the sentinel too
+                    self.in_q.put(_DONE)
+                    break
+                try:
+                    out = self.func(item)
+                except Exception as e:
+                    out = self.on_error(item, e)
+                if self.out_q is not None:
+                    self.out_q.put(out)
+        finally:
+            self._finish()
+
+    def _finish(self):
+        with self.lock:
+            self.remaining -= 1
+            last = self.remaining == 0
+        if last and self.out_q is not None:
+            self.out_q.put(_DONE)
+
+class PhotoRecord:
+    """
+    One photo travelling through the pipeline.
+    time is the capture time in wall-clock epoch seconds, match is (lat, lon) or None.
+    For reports, utc is the capture time resolved to UTC and fix_time the time
+    of the nearest timeline point.
+    data is the whole file when it was read ahead (see Pipeline).
+    outcome and dest_path are set by the write stage.
+    """
+    __slots__ = ("path", "size", "mtime_ns", "time", "has_gps", "match", "utc", "fix_time",
+                 "data", "outcome", "dest_path", "finished")
+
+    def __init__(self, path, size=0, mtime_ns=0):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.time = None
+        self.has_gps = False
+        self.match = None
+        self.utc = None
+        self.fix_time = None
+        self.data = None
+        self.outcome = None
+        self.dest_path = None
+        self.finished = False
+
+def _read_spilled(f):
+    """
+    Yields the PhotoRecords written to f by Pipeline._match_calibrated.
+    """
+    while True:
+        try:
+            path, size, mtime_ns, t, has_gps = pickle.load(f)
+        except EOFError:
+            return
+        record = PhotoRecord(path, size, mtime_ns)
+        record.time, record.has_gps = t, has_gps
+        yield record
+
+class Pipeline:
+    """
+    Photo processing engine made of four stages connected by bounded queues:
+    discovery -> timestamp extraction -> GPS matching -> EXIF writing/copying.
+    Discovery streams photos into the pipeline while the source is still being
+    scanned (on scan_workers threads); until the scan ends, progress is reported
+    with total None.
+    Timestamp reads and writes are I/O bound and run on thread pools;
+    matching runs on one thread in batches against the TimelineIndex.
+    With a Manifest, photos finished by an earlier run are skipped at discovery.
+    match_mode and max_gap (seconds) are passed to TimelineIndex.lookup_many.
+    Camera times are resolved to UTC against the timeline's UTC offsets, or
+    with the fixed camera_offset (seconds) when given, then corrected by
+    clock_offset (seconds, see calibration.py). With calibrate, matching waits
+    until every capture time has been read: calibrate(utc_times) gets them all,
+    resolved to UTC, and returns the clock_offset to use (e.g. the estimated one).
+    Unchanged photos are transferred with a FileTransfer using transfer_mode.
+    With io_buffer (bytes), a prefetch stage between matching and writing reads
+    the JPEGs that will be rewritten into memory, so on high-latency storage the
+    reads of upcoming photos overlap the writes of earlier ones. The data is
+    held until the photo is finished; all of it together stays within io_buffer.
+    With dry_run, nothing is written: the outcome each photo would get is
+    predicted from its header. Every photo is added to report (a MatchReport) if given.
+    Per-stage counters and timings are collected in metrics.
+    """
+    def __init__(self, index, src_folder, dest_folder, overwrite=False, workers=None, on_progress=None,
+                 manifest=None, match_mode=MATCH_NEAREST, max_gap=None, metrics=None, camera_offset=None,
+                 transfer_mode=TRANSFER_AUTO, scan_workers=1, dry_run=False, report=None,
+                 clock_offset=0.0, calibrate=None, io_buffer=0):
+        self.index = index
+        self.src_folder = src_folder
+        self.dest_folder = dest_folder
+        self.overwrite = overwrite
+        self.workers = max(1, workers or default_workers())
+        self.scan_workers = max(1, scan_workers or 1)
+        self.on_progress = on_progress
+        self.manifest = manifest
+        self.match_mode = match_mode
+        self.max_gap = max_gap
+        self.camera_offset = camera_offset
+        self.clock_offset = clock_offset
+        self.calibrate = calibrate
+        self.transfer = FileTransfer(transfer_mode, src_folder, dest_folder)
+        self.dry_run = dry_run
+        self.report = report
+        self.budget = MemoryBudget(io_buffer) if io_buffer and not dry_run else None
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.total = 0
+        self.scanning = False
+        self.processed = 0
+        # Outcome per photo: tagged (GPS written), kept (existing GPS left as-is),
+        # unmatched (no timeline point, copied), failed, skipped (unchanged since last run)
+        self.counts = {"tagged": 0, "kept": 0, "unmatched": 0, "failed": 0, "skipped": 0}
+        self.lock = threading.Lock()
+
+    def run(self):
+        """
+        Processes every image under src_folder. Returns the number processed.
+        """
+        path_q = queue.Queue(QUEUE_SIZE)
+        time_q = queue.Queue(QUEUE_SIZE)
+        write_q = queue.Queue(QUEUE_SIZE)
+
+        stages = [_Stage("timestamp", self._read_timestamp, path_q, time_q, self.workers, self._read_failed)]
+        match_q = write_q
+        if self.budget is not None:
+            match_q = queue.Queue(QUEUE_SIZE)
+            stages.append(_Stage("prefetch", self._prefetch, match_q, write_q, self.workers, self._prefetch_failed))
+        stages.append(_Stage("write", self._write, write_q, None, self.workers, self._failed))
+        matcher = threading.Thread(target=self._match, args=(time_q, match_q), name="match", daemon=True)
+        for stage in stages:
+            stage.start()
+        matcher.start()
+
+        self._discover(path_q)
+
+        stages[0].join()
+        matcher.join()
+        for stage in stages[1:]:
+            stage.join()
+        return self.processed
+
+    def _discover(self, path_q):
+        self.scanning = True
+        try:
+            entries = iter_image_entries(self.src_folder, self.scan_workers)
+            while True:
+                began = time.perf_counter()
+                entry = next(entries, None)
+                self.metrics.add("scan", time.perf_counter() - began, 0)
+                if entry is None:
+                    break
+                record = PhotoRecord(entry.path)
+                if self.manifest is not None:
+                    try:
+                        with self.metrics.timed("scan", 0):
+                            st = entry.stat()
+                    except OSError as e:
+                        print(f"Error reading {entry.path}: {e}", file=sys.stderr)
+                        continue
+                    record.size, record.mtime_ns = st.st_size, st.st_mtime_ns
+                    if self.manifest.is_unchanged(entry.path, record.size, record.mtime_ns):
+                        self.counts["skipped"] += 1
+                        continue
+                self.total += 1
+                self.metrics.add("scan", 0.0)
+                path_q.put(record)
+        finally:
+            self.scanning = False
+            path_q.put(_DONE)
+
+    def _read_timestamp(self, record):
+        try:
+            with self.metrics.timed("timestamp"):
+                dt, record.has_gps = get_image_header(record.path)
+                record.time = to_epoch(dt)
+        except Exception as e:
+            print(f"Error reading timestamp of {record.path}: {e}", file=sys.stderr)
+        return record
+
+    def _match(self, time_q, write_q):
+        # Buffer photos and match them in batches; a partial batch is
+        # flushed whenever the input queue runs dry so writers never starve.
+        if self.calibrate is not None:
+            self._match_calibrated(time_q, write_q)
+            return
+        batch = []
+        while True:
+            item = time_q.get()
+            finished = item is _DONE
+            if not finished:
+                batch.append(item)
+            if batch and (finished or len(batch) >= MATCH_BATCH_SIZE or time_q.empty()):
+                self._match_batch(batch, write_q)
+                batch = []
+            if finished:
+                write_q.put(_DONE)
+                return
+
+    def _match_calibrated(self, time_q, write_q):
+        # The clock offset depends on every capture time, so all photos wait
+        # here until the last one is in. Only the times stay in memory; the
+        # records (times already read) are spilled to a temporary file and
+        # read back for matching, so memory does not grow with the photo count
+        try:
+            with tempfile.TemporaryFile() as spill:
+                times = array('d')
+                while True:
+                    item = time_q.get()
+                    if item is _DONE:
+                        break
+                    if item.time is not None:
+                        times.append(item.time)
+                    pickle.dump((item.path, item.size, item.mtime_ns, item.time, item.has_gps), spill,
+                                pickle.HIGHEST_PROTOCOL)
+                try:
+                    self.clock_offset = self.calibrate(self.index.resolve_local_times(times, self.camera_offset)) or 0.0
+                except Exception as e:
+                    print(f"Error estimating the camera clock offset: {e}", file=sys.stderr)
+                del times
+                spill.seek(0)
+                batch = []
+                for record in _read_spilled(spill):
+                    batch.append(record)
+                    if len(batch) >= MATCH_BATCH_SIZE:
+                        self._match_batch(batch, write_q)
+                        batch = []
+                if batch:
+                    self._match_batch(batch, write_q)
+        except Exception as e:
+            # e.g. no room for the temporary file; the photos still waiting are lost
+            print(f"Error matching photos: {e}", file=sys.stderr)
+        finally:
+            write_q.put(_DONE)
+
+    def _match_batch(self, batch, write_q):
+        # The batch's capture times, read once by the timestamp stage,
+        # are the only input to matching
+        dated = [r for r in batch if r.time is not None]
+        try:
+            with self.metrics.timed("match", len(dated)):
+                times = array('d', (r.time for r in dated))
+                times = self.index.resolve_local_times(times, self.camera_offset)
+                if self.clock_offset:
+                    times = array('d', (t + self.clock_offset for t in times))
+                for record, match in zip(dated, self.index.lookup_many(times, self.match_mode, self.max_gap)):
+                    record.match = match
+                if self.report is not None and len(self.index):
+                    index_times = self.index.times
+                    for record, t in zip(dated, times):
+                        record.utc = t
+                        record.fix_time = index_times[self.index.nearest_index(t)]
+        except Exception as e:
+            # The batch is counted as failed instead of stopping the matcher
+            for record in batch:
+                self._failed(record, e)
+        else:
+            for record in batch:
+                write_q.put(record)
+
+    def _prefetch(self, record):
+        # Only JPEGs that get GPS written are read in full; the rest are
+        # transferred by path, and RAW/HEIF files only get a sidecar
+        if (record.match is None or is_sidecar_format(record.path)
+                or (record.has_gps and not self.overwrite)):
+            return record
+        with self.metrics.timed("prefetch"):
+            with open(record.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if not self.budget.fits(size):
+                    return record
+                self.budget.acquire(size)
+                data = f.read(size + 1)
+        if len(data) != size:
+            # Changed while being read; the write stage reads the file itself
+            self.budget.release(size)
+            return record
+        record.data = data
+        return record
+
+    def _prefetch_failed(self, record, error):
+        # The write stage reads the file itself (and reports the error if it persists)
+        print(f"Error reading ahead {record.path}: {error}", file=sys.stderr)
+        return record
+
+    def _write(self, record):
+        img_path, match = record.path, record.match
+        # Calculate destination path maintaining structure
+        rel_path = os.path.relpath(img_path, self.src_folder)
+        target_dir = os.path.join(self.dest_folder, os.path.dirname(rel_path))
+
+        began = time.perf_counter()
+        dest_path = None
+        sidecar = is_sidecar_format(img_path)
+        if self.dry_run:
+            # Same decisions as below, taken from the header read by the timestamp stage
+            if match is None:
+                outcome = "unmatched"
+            elif record.has_gps and not self.overwrite:
+                outcome = "kept"
+            else:
+                outcome = "tagged"
+        elif match is not None:
+            lat, lon = match
+            if sidecar:
+                # RAW/HEIF: write an .xmp sidecar instead of copying the file
+                written, dest_path = write_xmp_sidecar(img_path, lat, lon, target_dir, self.overwrite,
+                                                       record.has_gps)
+            else:
+                written, dest_path = add_gps_to_exif(img_path, lat, lon, target_dir, self.overwrite,
+                                                     self.transfer, record.data)
+            if sidecar and record.has_gps and not self.overwrite:
+                # Left untouched: no sidecar, so no output for the manifest
+                outcome = "kept"
+            elif dest_path is None:
+                outcome = "failed"
+            else:
+                outcome = "tagged" if written else "kept"
+        elif sidecar:
+            # Nothing to write for an unmatched RAW/HEIF file
+            outcome = "unmatched"
+        else:
+            # No point found: transfer as-is so destination has everything
+            try:
+                os.makedirs(target_dir, exist_ok=True)
+                dest_path = os.path.join(target_dir, os.path.basename(img_path))
+                self.transfer(img_path, dest_path)
+                outcome = "unmatched"
+            except Exception as e:
+                print(f"Error copying {img_path}: {e}", file=sys.stderr)
+                dest_path = None
+                outcome = "failed"
+
+        # Only tagged photos have their EXIF rewritten, the rest are plain copies
+        if not self.dry_run:
+            self.metrics.add("write" if outcome == "tagged" else "copy", time.perf_counter() - began)
+        record.outcome, record.dest_path = outcome, dest_path
+        self._finish(record)
+        return record
+
+    def _read_failed(self, record, error):
+        # The photo goes on without a capture time, like an unreadable header
+        print(f"Error reading timestamp of {record.path}: {error}", file=sys.stderr)
+        return record
+
+    def _failed(self, record, error):
+        """
+        Stage error handler: logs the photo and counts it as failed (once).
+        """
+        print(f"Error processing {record.path}: {error}", file=sys.stderr)
+        record.outcome, record.dest_path = "failed", None
+        self._finish(record)
+        return record
+
+    def _finish(self, record):
+        # Never raises: it runs last for every photo, and is what a failing
+        # stage falls back to
+        if record.finished:
+            return
+        record.finished = True
+        if record.data is not None:
+            self.budget.release(len(record.data))
+            record.data = None
+        img_path, match, outcome, dest_path = record.path, record.match, record.outcome, record.dest_path
+        try:
+            if self.report is not None:
+                self.report.add(img_path, record.time, record.utc, record.fix_time, match, outcome)
+
+            if self.manifest is not None and outcome != "failed" and not self.dry_run:
+                self.manifest.record(img_path, record.size, record.mtime_ns, match, outcome, dest_path)
+        except Exception as e:
+            # e.g. the report's disk is full or the manifest database failed
+            print(f"Error recording {img_path}: {e}", file=sys.stderr)
+            outcome = "failed"
+
+        with self.lock:
+            self.counts[outcome] += 1
+            self.processed += 1
+            done = self.processed
+        if self.on_progress:
+            try:
+                # The total is only known once discovery has finished
+                self.on_progress(done, None if self.scanning else self.total, img_path)
+            except Exception as e:
+                print(f"Error reporting progress: {e}", file=sys.stderr)
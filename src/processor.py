@@ -0,0 +1,219 @@
+import os
+import time
+from .calibration import clock_offset_report, estimate_clock_offset
+from .compaction import COMPACT_METERS, COMPACT_SECONDS
+from .gps_utils import MATCH_MODES, MATCH_NEAREST
+from .timeline_cache import load_timeline
+from .transfer import TRANSFER_AUTO, TRANSFER_MODES
+from .manifest import Manifest
+from .pipeline import Pipeline
+from .progress import Metrics, ProgressThrottle
+from .report import MatchReport
+
+# Minimum seconds between two progress updates
+PROGRESS_INTERVAL = 0.2
+
+class ProcessingError(Exception):
+    """
+    Raised when a job cannot be run (bad paths, empty timeline, ...).
+    The message is meant to be shown to the user as-is.
+    """
+
+def validate_paths(json_path, src_folder, dest_folder):
+    """
+    Checks the job paths and raises ProcessingError with a user-facing message.
+    """
+    if not all([json_path, src_folder, dest_folder]):
+        raise ProcessingError("Please select all paths.")
+
+    timeline_paths = [json_path] if isinstance(json_path, str) else json_path
+    if not all(os.path.exists(path) for path in timeline_paths):
+        raise ProcessingError("JSON file does not exist.")
+
+    if not os.path.isdir(src_folder):
+        raise ProcessingError("Source folder does not exist.")
+
+    # Outputs would replace the photos they are made from
+    src_real = os.path.normcase(os.path.realpath(src_folder))
+    dest_real = os.path.normcase(os.path.realpath(dest_folder))
+    if src_real == dest_real or (os.path.isdir(dest_folder) and os.path.samefile(src_folder, dest_folder)):
+        raise ProcessingError("Destination folder must be different from the source folder.")
+    # The source is scanned while outputs are written, so outputs inside it
+    # would be found and processed again
+    try:
+        nested = os.path.commonpath([src_real, dest_real]) == src_real
+    except ValueError:
+        # Different drives
+        nested = False
+    if nested:
+        raise ProcessingError("Destination folder must not be inside the source folder.")
+
+def run_job(json_path, src_folder, dest_folder, overwrite=False, workers=0,
+            on_status=None, on_progress=None, use_cache=True, incremental=False,
+            match_mode=MATCH_NEAREST, max_gap_minutes=0, progress_interval=PROGRESS_INTERVAL,
+            camera_utc_offset=None, transfer_mode=TRANSFER_AUTO, scan_workers=1,
+            dry_run=False, report_path=None, estimate_clock=False, apply_clock=False,
+            low_memory=False, compact=False, compact_meters=COMPACT_METERS,
+            compact_seconds=COMPACT_SECONDS, io_buffer_mb=0):
+    """
+    Runs a complete job without any GUI: load the timeline, then tag and copy
+    every image under src_folder into dest_folder.
+    json_path may be a timeline file, a folder of them or a list of either;
+    all sources are merged into one timeline.
+    on_status(text) receives phase messages, on_progress(done, total, path) progress
+    updates, at most once per progress_interval seconds. Both are called from
+    worker threads.
+    The parsed timeline is reused from the compiled cache unless use_cache is False.
+    With incremental, photos recorded in the destination's manifest by a run
+    with the same output options are skipped.
+    match_mode selects nearest/interpolated matching; photos further than
+    max_gap_minutes from the timeline are left unmatched (0 = unlimited).
+    camera_utc_offset (hours) fixes the time zone the camera clock is set to;
+    None resolves each photo with the UTC offset recorded in the timeline.
+    transfer_mode selects how unchanged photos reach dest_folder (see transfer.py).
+    scan_workers threads list source subfolders in parallel; photos are processed
+    while the scan is still running.
+    With dry_run, photos are only matched (header reads, no writes; the manifest
+    is only read) to preview what a real run would do. report_path writes a per-photo CSV
+    report; the summary then includes a histogram of the time deltas.
+    estimate_clock estimates the camera clock error from the capture times the
+    pipeline reads (photos skipped by incremental are left out), before any
+    photo is matched, and reports it; apply_clock also corrects the photos by it.
+    low_memory keeps memory independent of the archive size: the manifest is
+    queried per photo instead of being loaded. Peak memory is reported in the metrics.
+    compact shrinks the timeline after loading: dropped points stay within
+    compact_meters of what matching returns, and kept points are at most
+    compact_seconds (or max_gap, if shorter) apart (see compaction.py). The
+    cache holds the compacted index.
+    io_buffer_mb (0 = off) lets the pipeline read photos ahead into memory, up to
+    that many MB, for high-latency storage (see Pipeline).
+    Returns a summary dict; raises ProcessingError if the job cannot run.
+    """
+    started = time.monotonic()
+    metrics = Metrics()
+    validate_paths(json_path, src_folder, dest_folder)
+    if match_mode not in MATCH_MODES:
+        raise ProcessingError(f"Unknown match mode: {match_mode}")
+    if transfer_mode not in TRANSFER_MODES:
+        raise ProcessingError(f"Unknown transfer mode: {transfer_mode}")
+    max_gap = max_gap_minutes * 60 if max_gap_minutes and max_gap_minutes > 0 else None
+    camera_offset = camera_utc_offset * 3600 if camera_utc_offset is not None else None
+    if io_buffer_mb and io_buffer_mb < 0:
+        raise ProcessingError("The I/O buffer size must not be negative.")
+    if compact and not (compact_meters > 0 and compact_seconds > 0):
+        raise ProcessingError("Compaction tolerances must be greater than 0.")
+    compaction = None
+    if compact:
+        # Kept points further apart than max_gap would leave the photos between them unmatched
+        seconds = compact_seconds if max_gap is None else min(compact_seconds, max_gap)
+        compaction = (float(compact_meters), float(seconds))
+
+    if on_status:
+        on_status("Loading GPS data...")
+    load_started = time.perf_counter()
+    points = load_timeline(json_path, use_cache, compaction=compaction)
+    metrics.add("load", time.perf_counter() - load_started, points.source_points)
+    if not points:
+        raise ProcessingError("No valid timeline points found in JSON.")
+    compaction_summary = None
+    if compaction is not None:
+        compaction_summary = {
+            "tolerance_meters": compaction[0],
+            "tolerance_seconds": compaction[1],
+            "points_before": points.source_points,
+            "points_after": len(points),
+            "ratio": round(points.source_points / len(points), 2),
+        }
+        if on_status:
+            on_status(f"Compacted timeline: {points.source_points} -> {len(points)} points")
+
+    clock = None
+
+    def calibrate(utc_times):
+        # Called by the pipeline once every capture time has been read
+        nonlocal clock
+        if on_status:
+            on_status("Estimating camera clock offset...")
+        with metrics.timed("calibrate"):
+            estimate = estimate_clock_offset(points, utc_times)
+        if estimate is None:
+            return 0.0
+        clock = clock_offset_report(points, utc_times, estimate)
+        clock["applied"] = apply_clock
+        if on_status:
+            on_status(f"Camera clock offset: {estimate:+.0f} s" + (" (applied)" if apply_clock else ""))
+        return estimate if apply_clock else 0.0
+
+    if on_status:
+        on_status(f"Loaded {len(points)} points. Finding images...")
+
+    # Timezone handling:
+    # Camera times are naive wall-clock values ("Wall clock time" of where
+    # the photo was taken), Timeline times carry an offset.
+    # TimelineIndex keeps the timeline's UTC offsets, so "17:05" (Image) is
+    # resolved with the offset in effect at that time ("17:05+09:00") and
+    # matched in UTC, which stays correct on trips across time zones.
+    try:
+        report = MatchReport(report_path) if dry_run or report_path else None
+    except OSError as e:
+        raise ProcessingError(f"Cannot write report: {e}")
+    manifest = None
+    if incremental:
+        # Photos finished with other options would come out differently,
+        # so they are not skipped
+        options = {
+            "overwrite": bool(overwrite),
+            "match_mode": match_mode,
+            "max_gap": max_gap,
+            "camera_offset": camera_offset,
+            "apply_clock": bool(apply_clock),
+            "compaction": compaction,
+        }
+        # A dry run skips what the real run would skip, but records nothing
+        manifest = Manifest(dest_folder, preload=not low_memory, read_only=dry_run, options=options)
+    try:
+        if on_progress is not None:
+            on_progress = ProgressThrottle(on_progress, progress_interval)
+        pipeline = Pipeline(points, src_folder, dest_folder, overwrite, workers,
+                            on_progress=on_progress, manifest=manifest,
+                            match_mode=match_mode, max_gap=max_gap, metrics=metrics,
+                            camera_offset=camera_offset, transfer_mode=transfer_mode,
+                            scan_workers=scan_workers, dry_run=dry_run, report=report,
+                            calibrate=calibrate if estimate_clock or apply_clock else None,
+                            io_buffer=int((io_buffer_mb or 0) * 1024 * 1024))
+        processed = pipeline.run()
+    finally:
+        if manifest is not None:
+            manifest.close()
+        if report is not None:
+            report.close()
+
+    summary = {
+        "timeline": json_path,
+        "source": src_folder,
+        "destination": dest_folder,
+        "dry_run": dry_run,
+        "report": report_path,
+        "overwrite": overwrite,
+        "incremental": incremental,
+        "match_mode": match_mode,
+        "max_gap_minutes": max_gap_minutes,
+        "camera_utc_offset": camera_utc_offset,
+        "transfer_mode": transfer_mode,
+        "clock_offset": clock,
+        "workers": pipeline.workers,
+        "scan_workers": pipeline.scan_workers,
+        "low_memory": low_memory,
+        "io_buffer_mb": io_buffer_mb,
+        "io_buffer_peak_mb": round(pipeline.budget.peak / (1024 * 1024), 1) if pipeline.budget else None,
+        "timeline_points": len(points),
+        "timeline_compaction": compaction_summary,
+        "total": pipeline.total,
+        "processed": processed,
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+    summary.update(pipeline.counts)
+    if report is not None:
+        summary["delta_histogram"] = report.histogram()
+    summary["metrics"] = metrics.snapshot()
+    return summary
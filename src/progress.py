@@ -0,0 +1,106 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Stages that are timed: timeline loading, clock offset estimation, then the pipeline stages
+STAGES = ("load", "calibrate", "scan", "timestamp", "match", "prefetch", "write", "copy")
+
+def peak_memory_mb():
+    """
+    Peak resident memory of this process in MB, or None if unavailable.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / (1024 * 1024)
+    return None
+
+class Metrics:
+    """
+    Thread-safe counters and accumulated time per pipeline stage.
+    Stage times are summed over all worker threads, so with N workers a
+    stage can report up to N times the wall-clock time.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {stage: 0 for stage in STAGES}
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.started = time.perf_counter()
+
+    def add(self, stage, seconds, count=1):
+        with self.lock:
+            self.counts[stage] = self.counts.get(stage, 0) + count
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, stage, count=1):
+        """
+        Times the enclosed block and adds it to stage.
+        """
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - began, count)
+
+    def snapshot(self):
+        """
+        Returns a JSON-serializable dict of the current counters and timings.
+        """
+        with self.lock:
+            stages = {
+                stage: {
+                    "count": self.counts[stage],
+                    "seconds": round(self.seconds[stage], 4),
+                    "avg_ms": round(self.seconds[stage] * 1000 / self.counts[stage], 3) if self.counts[stage] else None,
+                }
+                for stage in self.counts
+            }
+        peak = peak_memory_mb()
+        return {
+            "elapsed_seconds": round(time.perf_counter() - self.started, 3),
+            "peak_memory_mb": round(peak, 1) if peak is not None else None,
+            "stages": stages,
+        }
+
+class ProgressThrottle:
+    """
+    Forwards progress updates to callback at most once per interval seconds.
+    Updates in between are dropped, except the final one (done == total),
+    so a fast pipeline does not flood the receiver. Safe to call from any thread.
+    """
+    def __init__(self, callback, interval=0.2):
+        self.callback = callback
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last = 0.0
+
+    def __call__(self, done, total, path):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last < self.interval and done != total:
+                return
+            self.last = now
+        self.callback(done, total, path)
@@ -0,0 +1,85 @@
+import csv
+import math
+import threading
+from .gps_utils import from_epoch
+
+REPORT_FIELDS = ("path", "capture_time", "matched_time", "delta_seconds", "lat", "lon", "action")
+# Upper bounds (seconds) and labels of the time delta histogram
+DELTA_BINS = (
+    (60, "<= 1 min"),
+    (5 * 60, "<= 5 min"),
+    (15 * 60, "<= 15 min"),
+    (60 * 60, "<= 1 h"),
+    (6 * 60 * 60, "<= 6 h"),
+    (24 * 60 * 60, "<= 1 day"),
+    (math.inf, "> 1 day"),
+)
+
+class MatchReport:
+    """
+    Per-photo match report: one CSV row per photo (when csv_path is given)
+    plus a histogram of the time between each photo and its nearest timeline point.
+    Rows are written as they arrive, so memory does not grow with the photo count.
+    Safe to call from worker threads.
+    """
+    def __init__(self, csv_path=None):
+        self.csv_path = csv_path
+        self.lock = threading.Lock()
+        self.counts = [0] * len(DELTA_BINS)
+        self.file = None
+        self.writer = None
+        if csv_path:
+            self.file = open(csv_path, "w", encoding="utf-8", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(REPORT_FIELDS)
+
+    def add(self, path, capture_time, capture_utc, matched_time, match, action):
+        """
+        Adds one photo. capture_time is the camera wall-clock epoch time,
+        capture_utc and matched_time (nearest timeline point) are UTC epoch
+        seconds; any of them may be None. match is (lat, lon) or None.
+        """
+        delta = None
+        if capture_utc is not None and matched_time is not None:
+            delta = matched_time - capture_utc
+        lat, lon = match if match is not None else ("", "")
+        row = (
+            path,
+            from_epoch(capture_time).isoformat(timespec="seconds") if capture_time is not None else "",
+            from_epoch(matched_time).isoformat(timespec="seconds") + "Z" if matched_time is not None else "",
+            f"{delta:.0f}" if delta is not None else "",
+            lat,
+            lon,
+            action,
+        )
+        with self.lock:
+            if delta is not None:
+                for i, (limit, _) in enumerate(DELTA_BINS):
+                    if abs(delta) <= limit:
+                        self.counts[i] += 1
+                        break
+            if self.writer is not None:
+                self.writer.writerow(row)
+
+    def histogram(self):
+        """
+        Returns the time delta histogram as a list of {"bin", "count"}.
+        """
+        with self.lock:
+            return [{"bin": label, "count": count} for (_, label), count in zip(DELTA_BINS, self.counts)]
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def format_histogram(histogram):
+    """
+    Formats a histogram from MatchReport.histogram as text lines with bars.
+    """
+    largest = max((row["count"] for row in histogram), default=0)
+    lines = []
+    for row in histogram:
+        bar = "#" * round(30 * row["count"] / largest) if largest else ""
+        lines.append(f"{row['bin']:>10} {row['count']:>8} {bar}")
+    return "\n".join(lines)
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import struct
+import sys
+from array import array
+from .config import CONFIG_FILE
+from .compaction import compact_timeline
+from .gps_utils import TimelineIndex
+from .timeline_formats import expand_sources, load_timeline_points
+
+# Compiled timeline is stored next to config.json
+CACHE_FILE = os.path.join(os.path.dirname(CONFIG_FILE), "timeline_cache.bin")
+
+MAGIC = b"L2EXTLC\x00"
+# Bump whenever the stored arrays or the way they are built changes
+CACHE_VERSION = 4
+# magic, version, total source size, source stamp (paths and mtimes), point count,
+# offset transition count, sha256 over the sources' contents, point count before
+# compaction, compaction tolerances in metres and seconds (0 = not compacted)
+_HEADER = struct.Struct("<8sIqqQQ32sQdd")
+
+def file_digest(path):
+    """
+    Returns the sha256 digest of a file, read in 1MB chunks.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.digest()
+
+def _read_array(f, count):
+    values = array("d")
+    values.fromfile(f, count)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+def _write_array(f, values):
+    if sys.byteorder == "big":
+        values = array("d", values)
+        values.byteswap()
+    values.tofile(f)
+
+def source_stamp(paths):
+    """
+    Returns (total size, stamp) for a list of source files; the stamp is a
+    64-bit hash of their paths and mtimes and changes when any file is touched.
+    """
+    h = hashlib.sha256()
+    size = 0
+    for path in paths:
+        st = os.stat(path)
+        size += st.st_size
+        h.update(f"{os.path.abspath(path)}\0{st.st_mtime_ns}\0".encode("utf-8"))
+    return size, int.from_bytes(h.digest()[:8], "little", signed=True)
+
+def sources_digest(paths):
+    """
+    Returns the sha256 over the paths and contents of all source files.
+    """
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.abspath(path).encode("utf-8") + b"\0")
+        h.update(file_digest(path))
+    return h.digest()
+
+def _restamp(cache_path, header, stamp):
+    """
+    Stores a new source stamp in the header of an existing cache file.
+    """
+    fields = list(_HEADER.unpack(header))
+    fields[3] = stamp
+    try:
+        with open(cache_path, "r+b") as f:
+            f.write(_HEADER.pack(*fields))
+    except OSError as e:
+        print(f"Error updating timeline cache: {e}", file=sys.stderr)
+
+def load_cached_timeline(json_path, cache_path=CACHE_FILE, compaction=None):
+    """
+    Returns the cached TimelineIndex for json_path (a file, folder or list,
+    see expand_sources), or None if there is no valid cache. Sizes and mtimes
+    are checked first; the content hashes are only computed when an mtime
+    changed (e.g. the same export copied again); when they still match, the
+    new mtimes are stored so later runs skip the hashing again.
+    compaction is the (metres, seconds) tolerances the index must have been
+    compacted with, or None for an uncompacted index.
+    """
+    meters, seconds = compaction if compaction is not None else (0.0, 0.0)
+    try:
+        paths = expand_sources(json_path)
+        size, stamp = source_stamp(paths)
+        with open(cache_path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return None
+            (magic, version, cached_size, cached_stamp, count, transitions, digest,
+             source_points, cached_meters, cached_seconds) = _HEADER.unpack(header)
+            if magic != MAGIC or version != CACHE_VERSION or cached_size != size:
+                return None
+            if cached_meters != meters or cached_seconds != seconds:
+                return None
+            if cached_stamp != stamp and sources_digest(paths) != digest:
+                return None
+            index = TimelineIndex(_read_array(f, count), _read_array(f, count), _read_array(f, count),
+                                  _read_array(f, transitions), _read_array(f, transitions))
+            index.source_points = source_points
+        if cached_stamp != stamp:
+            _restamp(cache_path, header, stamp)
+        return index
+    except (OSError, EOFError, struct.error):
+        return None
+
+def save_cached_timeline(json_path, index, cache_path=CACHE_FILE, compaction=None):
+    """
+    Writes index to cache_path, keyed by the sizes, mtimes and hashes of the
+    json_path sources and by the compaction tolerances it was built with.
+    """
+    meters, seconds = compaction if compaction is not None else (0.0, 0.0)
+    try:
+        paths = expand_sources(json_path)
+        size, stamp = source_stamp(paths)
+        header = _HEADER.pack(MAGIC, CACHE_VERSION, size, stamp,
+                              len(index), len(index.offsets), sources_digest(paths),
+                              index.source_points, meters, seconds)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            _write_array(f, index.times)
+            _write_array(f, index.lats)
+            _write_array(f, index.lons)
+            _write_array(f, index.offset_times)
+            _write_array(f, index.offsets)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Error saving timeline cache: {e}", file=sys.stderr)
+
+def load_timeline(json_path, use_cache=True, cache_path=CACHE_FILE, compaction=None):
+    """
+    Loads json_path (one or more timeline files or folders) through the compiled
+    cache when possible, parsing the sources (and refreshing the cache) only when they changed.
+    With compaction, a (metres, seconds) pair, the timeline is compacted after
+    parsing (see compaction.py) and the cache holds the compacted index.
+    """
+    if use_cache:
+        index = load_cached_timeline(json_path, cache_path, compaction)
+        if index is not None:
+            return index
+
+    index = load_timeline_points(json_path)
+    if compaction is not None and index:
+        index = compact_timeline(index, *compaction)
+    if use_cache and index:
+        save_cached_timeline(json_path, index, cache_path, compaction)
+    return index
@@ -0,0 +1,325 @@
+import abc
+import heapq
+import os
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from .gps_utils import (UNKNOWN_OFFSET, TimelineIndex, parse_geo_point, parse_timestamp,
+                        sort_columns, to_utc_epoch)
+from .json_stream import JsonStream
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Bytes read from the start of a file to detect its format
+SNIFF_SIZE = 64 * 1024
+# Coordinates are compared at E7 precision when removing duplicate points
+DEDUP_DIGITS = 7
+
+def parse_point(point):
+    """
+    Converts one timelinePath entry to (utc_epoch, lat, lon, utc_offset), or None if invalid.
+    """
+    p_str = point.get('point')
+    t_str = point.get('time')
+    if p_str and t_str:
+        lat, lon = parse_geo_point(p_str)
+        dt = parse_timestamp(t_str)
+        if lat is not None and lon is not None and dt is not None:
+            t, offset = to_utc_epoch(dt)
+            return t, lat, lon, offset
+    return None
+
+def parse_utc_point(lat, lon, time_str):
+    """
+    Converts coordinates and a UTC timestamp string to (utc_epoch, lat, lon, UNKNOWN_OFFSET),
+    or None if invalid. Used by formats that do not record the local time zone.
+    """
+    dt = parse_timestamp(time_str)
+    if dt is None or lat is None or lon is None:
+        return None
+    return to_utc_epoch(dt)[0], lat, lon, UNKNOWN_OFFSET
+
+def parse_e7(entry, lat_key, lon_key):
+    """
+    Returns (lat, lon) from integer E7 fields (degrees * 10^7), or (None, None).
+    """
+    try:
+        return float(entry[lat_key]) / 1e7, float(entry[lon_key]) / 1e7
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+def parse_e7_time(entry, key):
+    """
+    Returns the UTC epoch seconds of a legacy entry's ISO "<key>" field,
+    or of its "<key>Ms" epoch milliseconds; None if neither is valid.
+    """
+    time_str = entry.get(key)
+    if time_str is not None:
+        dt = parse_timestamp(time_str)
+        return to_utc_epoch(dt)[0] if dt is not None else None
+    try:
+        return int(entry[key + 'Ms']) / 1000
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def e7_point(entry, lat_key, lon_key, t):
+    """
+    Returns (utc_epoch, lat, lon, UNKNOWN_OFFSET) for an E7 entry, or None if invalid.
+    """
+    lat, lon = parse_e7(entry, lat_key, lon_key)
+    if lat is None or t is None:
+        return None
+    return t, lat, lon, UNKNOWN_OFFSET
+
+def iter_json_items(f, key):
+    """
+    Yields the elements of the top-level array f[key] one at a time.
+    Uses ijson when installed, otherwise the built-in JsonStream reader.
+    """
+    if ijson is not None:
+        yield from ijson.items(f, key + '.item')
+        return
+
+    stream = JsonStream(f)
+    for name in stream.iter_object():
+        if name != key:
+            stream.skip_value()
+            continue
+        yield from stream.iter_array()
+
+class TimelineLoader(abc.ABC):
+    """
+    Base class of the timeline format plugins.
+    A loader reads one file and yields (utc_epoch, lat, lon, utc_offset) tuples;
+    utc_offset is UNKNOWN_OFFSET when the format only records UTC.
+    Every loader implements parse_item for one item of its file. JSON formats
+    set json_key, the top-level key that identifies them, and get the elements
+    of that array as items; other formats override iter_points to find theirs.
+    """
+    name = None
+    extensions = ()
+    json_key = None
+
+    def open(self, path):
+        if self.json_key is not None and ijson is None:
+            return open(path, 'r', encoding='utf-8')
+        return open(path, 'rb')
+
+    def iter_points(self, f):
+        for item in iter_json_items(f, self.json_key):
+            for point in self.parse_item(item):
+                if point is not None:
+                    yield point
+
+    @abc.abstractmethod
+    def parse_item(self, item):
+        """
+        Yields the points (or None for invalid ones) of one item.
+        """
+
+class SemanticSegmentsLoader(TimelineLoader):
+    """
+    Google Maps Timeline export from the device: 'semanticSegments'.
+    timelinePath points are used as they are; visits and activities only give
+    a place at the start and end of the segment, which fills gaps between paths.
+    """
+    name = "semanticSegments"
+    extensions = ('.json',)
+    json_key = 'semanticSegments'
+
+    def parse_item(self, segment):
+        for point in segment.get('timelinePath') or ():
+            yield parse_point(point)
+
+        start_time = segment.get('startTime')
+        end_time = segment.get('endTime')
+        visit = segment.get('visit')
+        if visit:
+            location = (visit.get('topCandidate') or {}).get('placeLocation') or {}
+            lat_lng = location.get('latLng')
+            yield parse_point({'point': lat_lng, 'time': start_time})
+            yield parse_point({'point': lat_lng, 'time': end_time})
+        activity = segment.get('activity')
+        if activity:
+            yield parse_point({'point': (activity.get('start') or {}).get('latLng'), 'time': start_time})
+            yield parse_point({'point': (activity.get('end') or {}).get('latLng'), 'time': end_time})
+
+class RecordsLoader(TimelineLoader):
+    """
+    Legacy Takeout 'Records.json': locations[] with latitudeE7/longitudeE7
+    and timestamp (or timestampMs). Times are UTC only.
+    """
+    name = "records"
+    extensions = ('.json',)
+    json_key = 'locations'
+
+    def parse_item(self, location):
+        yield e7_point(location, 'latitudeE7', 'longitudeE7', parse_e7_time(location, 'timestamp'))
+
+class TimelineObjectsLoader(TimelineLoader):
+    """
+    Semantic Location History (monthly files, also exported by phones):
+    'timelineObjects' with activitySegment / placeVisit. Times are UTC only.
+    """
+    name = "timelineObjects"
+    extensions = ('.json',)
+    json_key = 'timelineObjects'
+
+    def parse_item(self, item):
+        activity = item.get('activitySegment')
+        if activity:
+            duration = activity.get('duration') or {}
+            yield e7_point(activity.get('startLocation') or {}, 'latitudeE7', 'longitudeE7',
+                           parse_e7_time(duration, 'startTimestamp'))
+            for point in (activity.get('simplifiedRawPath') or {}).get('points') or ():
+                yield e7_point(point, 'latE7', 'lngE7', parse_e7_time(point, 'timestamp'))
+            yield e7_point(activity.get('endLocation') or {}, 'latitudeE7', 'longitudeE7',
+                           parse_e7_time(duration, 'endTimestamp'))
+
+        visit = item.get('placeVisit')
+        if visit:
+            duration = visit.get('duration') or {}
+            location = visit.get('location') or {}
+            if 'latitudeE7' not in location:
+                # Older files only have the visit's center
+                location = {'latitudeE7': visit.get('centerLatE7'), 'longitudeE7': visit.get('centerLngE7')}
+            yield e7_point(location, 'latitudeE7', 'longitudeE7', parse_e7_time(duration, 'startTimestamp'))
+            yield e7_point(location, 'latitudeE7', 'longitudeE7', parse_e7_time(duration, 'endTimestamp'))
+
+class GpxLoader(TimelineLoader):
+    """
+    GPX 1.0/1.1 tracks, routes and waypoints from GPS loggers.
+    Parsed incrementally; each point element is discarded once read.
+    """
+    name = "gpx"
+    extensions = ('.gpx',)
+
+    def iter_points(self, f):
+        for _, elem in ET.iterparse(f, events=('end',)):
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag not in ('trkpt', 'rtept', 'wpt'):
+                continue
+            for point in self.parse_item(elem):
+                if point is not None:
+                    yield point
+            elem.clear()
+
+    def parse_item(self, elem):
+        time_str = None
+        for child in elem:
+            if child.tag.rsplit('}', 1)[-1] == 'time':
+                time_str = (child.text or '').strip()
+        try:
+            lat, lon = float(elem.get('lat')), float(elem.get('lon'))
+        except (TypeError, ValueError):
+            lat = lon = None
+        yield parse_utc_point(lat, lon, time_str)
+
+# Registered format plugins; the first JSON loader is the default for JSON files
+LOADERS = [SemanticSegmentsLoader(), RecordsLoader(), TimelineObjectsLoader(), GpxLoader()]
+
+def register_loader(loader):
+    """
+    Adds a format plugin (a TimelineLoader instance).
+    """
+    LOADERS.append(loader)
+    return loader
+
+def timeline_extensions():
+    return {ext for loader in LOADERS for ext in loader.extensions}
+
+def detect_loader(path):
+    """
+    Returns the loader for path. XML files are matched by extension, JSON files
+    by the first known top-level key near the start of the file.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(SNIFF_SIZE)
+    ext = os.path.splitext(path)[1].lower()
+    json_loaders = [loader for loader in LOADERS if loader.json_key is not None]
+    for loader in LOADERS:
+        if loader.json_key is None and ext in loader.extensions:
+            return loader
+
+    best, best_pos = None, len(head)
+    for loader in json_loaders:
+        pos = head.find(b'"' + loader.json_key.encode('utf-8') + b'"')
+        if pos != -1 and pos < best_pos:
+            best, best_pos = loader, pos
+    if best is None and head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<'):
+        return next((loader for loader in LOADERS if isinstance(loader, GpxLoader)), None)
+    return best or (json_loaders[0] if json_loaders else None)
+
+def expand_sources(sources):
+    """
+    Returns the sorted list of timeline files for a path, a folder (searched
+    recursively for known extensions) or a list of either.
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    extensions = timeline_extensions()
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                for file in files:
+                    if os.path.splitext(file)[1].lower() in extensions:
+                        paths.add(os.path.join(root, file))
+        else:
+            paths.add(source)
+    return sorted(paths)
+
+def read_columns(path, loader=None):
+    """
+    Reads one timeline file into parallel arrays (times, lats, lons, offsets), sorted by time.
+    """
+    loader = loader or detect_loader(path)
+    times, lats, lons, offsets = array('d'), array('d'), array('d'), array('d')
+    with loader.open(path) as f:
+        for t, lat, lon, offset in loader.iter_points(f):
+            times.append(t)
+            lats.append(lat)
+            lons.append(lon)
+            offsets.append(offset)
+    return sort_columns(times, lats, lons, offsets)
+
+def merge_columns(columns):
+    """
+    Merges several sorted column sets into one with a k-way merge.
+    Points at the same time and place (E7 precision) are kept once,
+    preferring a copy that carries its UTC offset.
+    """
+    times, lats, lons, offsets = array('d'), array('d'), array('d'), array('d')
+    last = None
+    for t, lat, lon, offset in heapq.merge(*(zip(*c) for c in columns)):
+        key = (t, round(lat, DEDUP_DIGITS), round(lon, DEDUP_DIGITS))
+        if key == last:
+            if offset == offset and offsets[-1] != offsets[-1]:
+                offsets[-1] = offset
+            continue
+        last = key
+        times.append(t)
+        lats.append(lat)
+        lons.append(lon)
+        offsets.append(offset)
+    return times, lats, lons, offsets
+
+def load_timeline_points(sources):
+    """
+    Loads one or more timeline files (any registered format; folders are searched)
+    and returns a single TimelineIndex sorted by time.
+    Every file is parsed incrementally into its own sorted columns, which are
+    merged and deduplicated in one pass. Files that fail to load are reported and skipped.
+    """
+    columns = []
+    for path in expand_sources(sources):
+        try:
+            columns.append(read_columns(path))
+        except Exception as e:
+            print(f"Error loading timeline {path}: {e}", file=sys.stderr)
+
+    # Offsets are compressed to transitions
+    return TimelineIndex.build(*merge_columns(columns))
@@ -0,0 +1,183 @@
+import contextlib
+import os
+import shutil
+import sys
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# How unchanged photos (no match, or existing GPS kept) reach the destination
+TRANSFER_AUTO = "auto"  # reflink -> copy_file_range -> copy, whatever the filesystem supports
+TRANSFER_COPY = "copy"
+TRANSFER_COPY_FILE_RANGE = "copy_file_range"
+TRANSFER_REFLINK = "reflink"
+TRANSFER_HARDLINK = "hardlink"
+TRANSFER_MOVE = "move"
+TRANSFER_MODES = (TRANSFER_AUTO, TRANSFER_COPY, TRANSFER_COPY_FILE_RANGE,
+                  TRANSFER_REFLINK, TRANSFER_HARDLINK, TRANSFER_MOVE)
+
+# Linux ioctl that clones a file's extents (btrfs, XFS, ...)
+FICLONE = 0x40049409
+COPY_CHUNK = 64 * 1024 * 1024
+
+def same_filesystem(src_folder, dest_folder):
+    """
+    True if both folders are on the same device. dest_folder may not exist yet,
+    in which case its nearest existing parent is checked.
+    """
+    try:
+        dest = os.path.abspath(dest_folder)
+        while not os.path.exists(dest):
+            parent = os.path.dirname(dest)
+            if parent == dest:
+                return False
+            dest = parent
+        return os.stat(src_folder).st_dev == os.stat(dest).st_dev
+    except OSError:
+        return False
+
+def temp_path(dest_path):
+    """
+    A unique hidden path next to dest_path to write to before replacing it.
+    """
+    folder, name = os.path.split(dest_path)
+    return os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+
+@contextlib.contextmanager
+def open_replacing(dest_path):
+    """
+    Opens a new file for binary writing that replaces dest_path once the block
+    completes. An existing dest_path is never opened for writing, so a
+    destination that is the source (or a hardlink to it) is not truncated
+    while it is still being read; on error dest_path is left as it was.
+    """
+    tmp = temp_path(dest_path)
+    try:
+        with open(tmp, "xb") as f:
+            yield f
+        os.replace(tmp, dest_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+def check_not_same_file(src_path, dest_path):
+    """
+    Raises shutil.SameFileError if dest_path is src_path itself (also through
+    a symlinked folder). Returns True if dest_path is a hardlink to src_path,
+    False otherwise.
+    """
+    try:
+        if not os.path.samefile(src_path, dest_path):
+            return False
+    except OSError:
+        # dest_path does not exist (yet)
+        return False
+    if os.path.normcase(os.path.realpath(src_path)) == os.path.normcase(os.path.realpath(dest_path)):
+        raise shutil.SameFileError(f"{src_path!r} and {dest_path!r} are the same file")
+    return True
+
+class FileTransfer:
+    """
+    Transfers unchanged photos with the cheapest method the destination allows.
+    The filesystem relation between source and destination is detected once;
+    methods that fail (e.g. reflink on ext4) are disabled for the rest of the run
+    and the next method is used instead, ending with a plain copy.
+    """
+    def __init__(self, mode=TRANSFER_AUTO, src_folder=None, dest_folder=None):
+        if mode not in TRANSFER_MODES:
+            raise ValueError(f"Unknown transfer mode: {mode}")
+        self.mode = mode
+        same_fs = same_filesystem(src_folder, dest_folder) if src_folder and dest_folder else True
+        self.lock = threading.Lock()
+        self.reflink_ok = (mode in (TRANSFER_AUTO, TRANSFER_REFLINK) and same_fs
+                           and fcntl is not None and sys.platform.startswith("linux"))
+        self.copy_file_range_ok = (mode in (TRANSFER_AUTO, TRANSFER_REFLINK, TRANSFER_COPY_FILE_RANGE)
+                                   and hasattr(os, "copy_file_range"))
+        self.link_ok = mode == TRANSFER_HARDLINK and same_fs
+
+    def _disable(self, name):
+        with self.lock:
+            setattr(self, name, False)
+
+    def __call__(self, src_path, dest_path, src_file=None):
+        """
+        Transfers src_path to dest_path (metadata preserved like shutil.copy2).
+        src_file may be an already open binary handle of src_path to read from.
+        Returns the method actually used. An existing dest_path is replaced,
+        never written over; raises shutil.SameFileError if it is src_path.
+        """
+        # e.g. left by an earlier run with --transfer hardlink
+        linked = check_not_same_file(src_path, dest_path)
+        if self.mode == TRANSFER_MOVE:
+            if src_file is not None:
+                # Windows can't rename a file that is still open
+                src_file.close()
+            if linked:
+                # The destination already is the file; renaming onto it would do nothing
+                os.remove(src_path)
+            else:
+                shutil.move(src_path, dest_path)
+            return TRANSFER_MOVE
+
+        if self.link_ok:
+            if linked:
+                return TRANSFER_HARDLINK
+            tmp = temp_path(dest_path)
+            try:
+                os.link(src_path, tmp)
+            except OSError:
+                self._disable("link_ok")
+            else:
+                try:
+                    os.replace(tmp, dest_path)
+                except BaseException:
+                    os.remove(tmp)
+                    raise
+                return TRANSFER_HARDLINK
+
+        if src_file is None:
+            with open(src_path, "rb") as f:
+                method = self._copy(f, dest_path)
+        else:
+            method = self._copy(src_file, dest_path)
+        shutil.copystat(src_path, dest_path)
+        return method
+
+    def _copy(self, src, dest_path):
+        with open_replacing(dest_path) as dst:
+            if self.reflink_ok:
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                    return TRANSFER_REFLINK
+                except OSError:
+                    self._disable("reflink_ok")
+
+            if self.copy_file_range_ok:
+                try:
+                    # Kernel-side copy; can be server-side on NFS 4.2 / SMB3
+                    size = os.fstat(src.fileno()).st_size
+                    offset = 0
+                    while offset < size:
+                        copied = os.copy_file_range(src.fileno(), dst.fileno(), min(COPY_CHUNK, size - offset),
+                                                    offset, offset)
+                        if copied == 0:
+                            break
+                        offset += copied
+                    if offset == size:
+                        return TRANSFER_COPY_FILE_RANGE
+                except OSError:
+                    self._disable("copy_file_range_ok")
+                dst.seek(0)
+                dst.truncate()
+
+            src.seek(0)
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            return TRANSFER_COPY
+
+# Plain copy, used when no FileTransfer is given
+copy_file = FileTransfer(TRANSFER_COPY)
@@ -2,8 +2,7 @@ import os
 import datetime
 import shutil
 from PIL import Image
-from src.gui import App # Import to test method indirectly or just emulate logic?
-# Since logic is in App.run_logic, and it's coupled with UI, I'll emulate the logic block exactly as I changed it.
+# Emulates the path logic of the processing pipeline without the GUI.
 
 def create_dummy_image(path, timestamp):
     os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -74,5 +73,28 @@ def verify_folder_structure():
     else:
         print(f"Structure Test B (Root): FAIL. Expected {dest_b}")
 
+def verify_nested_destination():
+    # The source folder is scanned while outputs are written, so a destination
+    # inside it would have its own outputs processed again
+    from src.processor import ProcessingError, validate_paths
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    src_folder = os.path.join(base_dir, "test_input")
+    json_path = os.path.join(base_dir, "sample_data", "timeline_sample.json")
+    os.makedirs(src_folder, exist_ok=True)
+
+    for name, dest_folder, rejected in (
+        ("Nested", os.path.join(src_folder, "c"), True),
+        ("Nested deeper", os.path.join(src_folder, "c", "d"), True),
+        ("Sibling", os.path.join(base_dir, "test_input_out"), False),
+    ):
+        try:
+            validate_paths(json_path, src_folder, dest_folder)
+            ok = not rejected
+        except ProcessingError:
+            ok = rejected
+        print(f"Destination Test {name}: {'OK' if ok else 'FAIL'}")
+
 if __name__ == "__main__":
     verify_folder_structure()
+    verify_nested_destination()